@@ -0,0 +1,471 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import psutil
+
+# Headless end-to-end benchmark: nemo.py, the simulator motor socket and the
+# NIM endpoint are replaced by the stand-ins in scripts/standins.py, then
+# main.Process / CommandHandler / execute_target are driven as in the app.
+#
+#   python benchmark.py                        synthetic scene, colour detector
+#   python benchmark.py --frames clip.mp4 --detector torch --json run.json
+#   python benchmark.py --compare run.json     exit code 1 on regression
+#   python benchmark.py --robots 8             eight robots, one process, batched detection
+#   python benchmark.py --transport shm raw jpeg lz4    frame transports over loopback
+#   python benchmark.py --frames clip.mp4 --backends torch onnx onnx-int8    detector backends
+
+import main
+from scripts import metrics
+from scripts.robots import RobotRegistry
+from scripts.framering import FrameReader, FrameWaiter
+from scripts.detectors import create_detector
+from scripts.standins import ColorDetector, FramePublisher, MotorSink, MockNim, load_frames
+
+# =========================
+# SCENARIOS
+# =========================
+# (name, kind, prompt, mock VLM reply). "fast" prompts never reach the VLM.
+SCENARIOS = [
+    ("forward", "fast", "move forward 1 second", None),
+    ("turn", "fast", "turn left", None),
+    ("vlm motion", "vlm", "Could you check that the way is clear and then go forward a little",
+     "The way looks clear. *forward 1* Moving ahead now."),
+    ("vlm late command", "vlm", "Describe the room and then turn to the right",
+     "I see a grey room with a red box in the middle of the floor, nothing else stands out. *right 0.5*"),
+    ("follow", "target", "follow the red box", None),
+    ("fleet follow", "fleet", "follow the red box", None),  # every robot at once, with --robots > 1
+]
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+class ResourceMonitor:
+    # CPU time and peak RSS of this process (the app side of the pipeline)
+    def __init__(self, interval=0.1):
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak_rss = 0
+        self._running = False
+
+    def start(self):
+        self._running = True
+        self.started = time.monotonic()
+        self.cpu_start = sum(self.process.cpu_times()[:2])
+        threading.Thread(target=self._loop, daemon=True).start()
+        return self
+
+    def _loop(self):
+        while self._running:
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+            time.sleep(self.interval)
+
+    def cpu_percent(self):
+        elapsed = time.monotonic() - self.started
+        return 100 * (sum(self.process.cpu_times()[:2]) - self.cpu_start) / elapsed if elapsed else 0.0
+
+    def stop(self):
+        self._running = False
+
+# =========================
+# RUNNER
+# =========================
+def settle(seconds):
+    for bot in main.robots: main.CommandHandler("stop", bot=bot)
+    time.sleep(seconds)
+
+def measure_tracking(bots, duration):
+    # Distinct frames each follow loop has processed, from its overlay updates -> mean fps per robot
+    seen = {bot.name: set() for bot in bots}
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        for bot in bots:
+            overlay = bot.current_overlay
+            if overlay is not None: seen[bot.name].add(overlay["frame_id"])
+        time.sleep(0.002)
+    return float(np.mean([len(frames) / duration for frames in seen.values()]))
+
+def run_scenario(sinks, kind, prompt, runs, warmup, track_seconds, settle_seconds, timeout):
+    # "fleet" sends the prompt to every robot ("@name ...") and waits for all of their first commands
+    bots = list(main.robots) if kind == "fleet" else [main.robots.get()]
+    selected = main.robots.get()
+    latencies, replies, tracker_fps = [], [], []
+    for i in range(warmup + runs):
+        settle(settle_seconds)
+        start = time.monotonic()
+        done = {}
+        def talk():
+            for bot in bots: main.Process(f"@{bot.name} {prompt}" if kind == "fleet" else prompt, None)
+            done["at"] = time.monotonic()
+        worker = threading.Thread(target=talk)
+        worker.start()
+        firsts = [sinks[bot.name].first_after(start, timeout) for bot in bots]
+        worker.join(timeout)
+        main.robots.resolve(f"@{selected.name}")
+        if i < warmup:
+            continue
+        if all(first is not None for first in firsts):
+            latencies.append(max(firsts) - start)
+        if "at" in done:
+            replies.append(done["at"] - start)
+        if kind in ("target", "fleet"):
+            tracker_fps.append(measure_tracking(bots, track_seconds))
+    settle(settle_seconds)
+    return {
+        "runs": runs,
+        "missed": runs - len(latencies),
+        "first_command_ms": {f"p{q}": percentile(latencies, q) * 1000 for q in (50, 95, 99)},
+        "reply_ms": {f"p{q}": percentile(replies, q) * 1000 for q in (50, 95, 99)},
+        "tracker_fps": float(np.mean(tracker_fps)) if tracker_fps else None,
+    }
+
+def backend_config(name):
+    # "torch" / "onnx" / "onnx-int8" -> create_detector() keyword arguments
+    backend, _, precision = name.partition("-")
+    return {**main.detector_cfg, "backend": backend, "int8": precision == "int8"}
+
+def setup_detector(name, cost, workers, meta_file):
+    # Loaded by main.LoadDetector itself: in-process, batched with several robots, or in a pool.
+    # "color" is built here and handed over, the production factory only knows real backends
+    main.pool_cfg = {**main.pool_cfg, "workers": workers}
+    if name != "color":
+        main.detector_cfg = backend_config(name)
+    def load():
+        if workers:
+            from scripts.detector_pool import DetectorPool
+            if name == "color":
+                main.pool = DetectorPool(workers=workers, meta_file=meta_file, detector={"cost": cost},
+                                         factory="scripts.standins:ColorDetector").start()
+            else:
+                main.pool = DetectorPool(workers=workers, meta_file=meta_file, detector=main.detector_cfg).start()
+            if not main.pool.wait_ready():
+                raise RuntimeError("detector workers did not start")
+        else:
+            main.LoadDetector(ColorDetector(cost=cost) if name == "color" else None)
+    main.loader.submit("detector", load)
+    if not main.loader.wait("detector", timeout=600):
+        raise RuntimeError(f"Detector failed to load: {main.loader.errors.get('detector')}")
+
+def robot_entry(index, directory, motor_port):
+    # Own frame ring, new-frame socket and motor socket per simulated robot
+    return {"name": "carter" if index == 0 else f"carter{index + 1}",
+            "meta_file": os.path.join(directory, f"Apdata_{index}.txt"),
+            "notify": f"tcp://127.0.0.1:{motor_port + 1000 + index}",
+            "motor": f"tcp://127.0.0.1:{motor_port + index}"}
+
+def run(args):
+    frames = load_frames(args.frames, size=(args.width, args.height))
+    directory = tempfile.mkdtemp(prefix="nemo-bench-")
+    entries = [robot_entry(i, directory, args.motor_port) for i in range(args.robots)]
+    publishers = [FramePublisher(frames[i % len(frames):] + frames[:i % len(frames)], fps=args.fps,
+                                 meta_file=entry["meta_file"], notify_address=entry["notify"]).start()
+                  for i, entry in enumerate(entries)]
+    sinks = {entry["name"]: MotorSink(entry["motor"], delay=args.sim_delay).start() for entry in entries}
+    replies = {prompt: reply for _, _, prompt, reply in SCENARIOS if reply}
+    mock = MockNim(replies, ttft=args.ttft, token_delay=args.token_delay).start()
+
+    if args.trace:
+        metrics.configure(enabled=True, trace_file=args.trace)
+    main.nv.api_cfg["url"] = mock.url
+    main.nv.params["stream"] = not args.no_stream
+    main.robots = RobotRegistry(entries)
+    for bot in main.robots:
+        main.Dialogue(bot)
+        main.AttachFrames(bot)
+    setup_detector(args.detector, args.detect_cost, args.pool, entries[0]["meta_file"])
+    main.robots.connect()
+    time.sleep(0.2)
+
+    monitor = ResourceMonitor().start()
+    results = {}
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        for name, kind, prompt, _ in SCENARIOS:
+            if args.only and name not in args.only: continue
+            if kind == "fleet" and args.robots < 2: continue
+            results[name] = run_scenario(sinks, kind, prompt, args.runs, args.warmup, args.track_seconds,
+                                         args.settle, args.timeout)
+    monitor.stop()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+        "scenarios": results,
+        "published_fps": publishers[0].published / (time.monotonic() - monitor.started),
+        "cpu_percent": monitor.cpu_percent(),
+        "peak_rss_mb": monitor.peak_rss / 2**20,
+        "threads": monitor.process.num_threads(),
+        "motor": main.robots.get().motor.stats(),
+        "vlm_requests": mock.requests,
+        "detector_pool": main.pool.stats() if main.pool else None,
+        "detector_batch": main.batcher.stats() if main.batcher else None,
+        "stages_ms": {name: mean * 1000 for name, (n, mean) in metrics.summary().items()},
+    }
+    if main.pool: main.pool.close()
+    main.robots.close()
+    for publisher in publishers: publisher.close()
+    for sink in sinks.values(): sink.close()
+    mock.close()
+    return report
+
+# =========================
+# FRAME TRANSPORTS
+# =========================
+def consume(reader, seconds):
+    # Frame ages at wakeup and distinct frames per second, copying each like a tracker does
+    waiter = FrameWaiter(reader)
+    ages, local, last_id, count = [], None, 0, 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        frame = waiter.wait(last_id, timeout=0.5)
+        if frame is None: continue
+        # Network frames are stamped on receipt, their capture time (same host here) is the sender's
+        remote = reader.remote(frame) if hasattr(reader, "remote") else None
+        ages.append(time.time() - remote[1] if remote else frame.age)
+        frame, local = reader.read(local)
+        last_id = frame.frame_id
+        count += 1
+    waiter.close()
+    return ages, count / seconds
+
+def run_transport(name, frames, fps, seconds, port):
+    # "shm": the shared-memory ring itself, anything else: that codec through the network stream
+    directory = tempfile.mkdtemp(prefix="nemo-transport-")
+    sender = None
+    if name != "shm":
+        from scripts.framenet import FrameSender
+        sender = FrameSender(f"tcp://127.0.0.1:{port + 2}", codec=name)
+    publisher = FramePublisher(frames, fps=fps, meta_file=os.path.join(directory, "sim.txt"),
+                               notify_address=f"tcp://127.0.0.1:{port}", sender=sender).start()
+    if sender is None:
+        reader = FrameReader.attach(publisher.meta_file)
+    else:
+        from scripts.framenet import NetFrameReader
+        reader = NetFrameReader.connect(f"tcp://127.0.0.1:{port + 2}", os.path.join(directory, "local.txt"),
+                                        f"tcp://127.0.0.1:{port + 1}", timeout=5.0)
+    monitor = ResourceMonitor().start()
+    ages, received = consume(reader, seconds)
+    published = publisher.published
+    monitor.stop()
+    result = {
+        "latency_ms": {f"p{q}": percentile(ages, q) * 1000 for q in (50, 95, 99)},
+        "received_fps": received,
+        "published_fps": published / seconds,
+        "cpu_percent": monitor.cpu_percent(),
+        "kb_per_frame": sender.stats()["mean_kb"] if sender else frames[0].nbytes / 1024,
+    }
+    reader.close()
+    publisher.close()
+    return result
+
+def run_transports(args):
+    # Latency at the simulator rate, then throughput with the publisher unthrottled
+    frames = load_frames(args.frames, size=(args.width, args.height))
+    report = {"config": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+              "transports": {}}
+    for i, name in enumerate(args.transport):
+        paced = run_transport(name, frames, args.fps, args.track_seconds, args.motor_port + 2000 + 10 * i)
+        flat_out = run_transport(name, frames, 1000.0, args.track_seconds, args.motor_port + 2005 + 10 * i)
+        paced["max_fps"] = flat_out["received_fps"]
+        paced["max_latency_ms"] = flat_out["latency_ms"]
+        report["transports"][name] = paced
+    return report
+
+def print_transports(report):
+    print(f"\n{'transport':<10}latency p50/p95/p99 (ms)   recv fps   max fps   max p50 (ms)   KB/frame   CPU")
+    for name, result in report["transports"].items():
+        latency = result["latency_ms"]
+        print(f"{name:<10}{latency['p50']:6.2f} {latency['p95']:6.2f} {latency['p99']:6.2f}        "
+              f"{result['received_fps']:8.1f}  {result['max_fps']:8.1f}   {result['max_latency_ms']['p50']:10.2f}   "
+              f"{result['kb_per_frame']:8.0f}   {result['cpu_percent']:3.0f}%")
+
+# =========================
+# DETECTOR BACKENDS
+# =========================
+def box_iou(a, b):
+    w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - w * h
+    return w * h / union if union > 0 else 0.0
+
+def mean_average_precision(detections, references, iou=0.5):
+    # VOC-style mAP@iou of per-frame detections against per-frame reference boxes (the first
+    # backend's output stands in for ground truth, so this measures drift, not accuracy)
+    aps = []
+    for cls in sorted({box[5] for frame in references for box in frame}):
+        truth = [[box for box in frame if box[5] == cls] for frame in references]
+        used = [[False] * len(boxes) for boxes in truth]
+        found = sorted(((box, i) for i, frame in enumerate(detections) for box in frame if box[5] == cls),
+                       key=lambda item: -item[0][4])
+        hits = []
+        for box, i in found:
+            overlaps = [box_iou(box, other) for other in truth[i]]
+            best = int(np.argmax(overlaps)) if overlaps else -1
+            hit = best >= 0 and overlaps[best] >= iou and not used[i][best]
+            if hit: used[i][best] = True
+            hits.append(hit)
+        tp = np.cumsum(hits)
+        recall = np.concatenate([[0.0], tp / sum(len(boxes) for boxes in truth), [1.0]])
+        precision = np.concatenate([[0.0], tp / np.arange(1, len(hits) + 1), [0.0]])
+        precision = np.maximum.accumulate(precision[::-1])[::-1]
+        steps = np.nonzero(recall[1:] != recall[:-1])[0]
+        aps.append(float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1])))
+    return float(np.mean(aps)) if aps else None
+
+def run_backend(name, frames, classes, imgsz, conf, cost, warmup):
+    # One image per call, like a tracker: load time, per-frame latency, and every frame's boxes
+    started = time.perf_counter()
+    if name == "color":
+        detector = ColorDetector(cost=cost)
+    else:
+        detector = create_detector(cache_dir=main.embedding_cfg.get("cache_dir", "models/embeddings"),
+                                   **backend_config(name))
+    detector.warmup(classes)
+    for image in frames[:warmup]:
+        detector.detect([image], classes, conf, imgsz)
+    load_seconds = time.perf_counter() - started
+
+    monitor = ResourceMonitor().start()
+    latencies, detections = [], []
+    for image in frames:
+        start = time.perf_counter()
+        detections.append(detector.detect([image], classes, conf, imgsz)[0])
+        latencies.append(time.perf_counter() - start)
+    monitor.stop()
+    return {
+        "load_s": load_seconds,
+        "fps": len(frames) / sum(latencies),
+        "latency_ms": {f"p{q}": percentile(latencies, q) * 1000 for q in (50, 95, 99)},
+        "boxes_per_frame": sum(len(boxes) for boxes in detections) / len(frames),
+        "cpu_percent": monitor.cpu_percent(),
+        "stats": detector.stats(),
+    }, detections
+
+def run_backends(args):
+    # Every backend over the same recorded frames; mAP drift is against the first one listed
+    frames = load_frames(args.frames, size=(args.width, args.height))
+    report = {"config": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+              "backends": {}}
+    reference = None
+    for name in args.backends:
+        result, detections = run_backend(name, frames, args.classes, args.imgsz, args.conf, args.detect_cost,
+                                         args.warmup)
+        if reference is None:
+            reference = detections
+        result["map50"] = mean_average_precision(detections, reference)
+        report["backends"][name] = result
+    return report
+
+def print_backends(report):
+    reference = report["config"]["backends"][0]
+    print(f"\n{'backend':<12}{'fps':>8}   latency p50/p95/p99 (ms)   boxes/frame   mAP@0.5 vs {reference:<8}"
+          f"load (s)")
+    for name, result in report["backends"].items():
+        latency = result["latency_ms"]
+        drift = f"{result['map50']:.3f}" if result["map50"] is not None else "-"
+        print(f"{name:<12}{result['fps']:8.1f}   {latency['p50']:6.2f} {latency['p95']:6.2f} {latency['p99']:6.2f}"
+              f"        {result['boxes_per_frame']:11.2f}   {drift:>17}  {result['load_s']:8.1f}")
+
+# =========================
+# REPORTING
+# =========================
+def print_report(report):
+    print(f"\n{'scenario':<18}{'runs':>5}{'miss':>5}   first command p50/p95/p99 (ms)   reply p50 (ms)   tracker fps")
+    for name, result in report["scenarios"].items():
+        first = result["first_command_ms"]
+        fps = f"{result['tracker_fps']:.1f}" if result["tracker_fps"] is not None else "-"
+        print(f"{name:<18}{result['runs']:>5}{result['missed']:>5}   "
+              f"{first['p50']:8.1f} {first['p95']:8.1f} {first['p99']:8.1f}        "
+              f"{result['reply_ms']['p50']:10.1f}   {fps:>11}")
+    print(f"\n{report['config']['robots']} robot(s), frames published {report['published_fps']:.1f} fps, "
+          f"CPU {report['cpu_percent']:.0f}%, peak RSS {report['peak_rss_mb']:.0f} MB, threads {report['threads']}, "
+          f"VLM requests {report['vlm_requests']}")
+    print(f"motor channel {report['motor']}")
+    if report["detector_batch"]:
+        print(f"detector batches {report['detector_batch']}")
+    if report["stages_ms"]:
+        print("stage means: " + ", ".join(f"{name} {ms:.2f} ms" for name, ms in sorted(report["stages_ms"].items())))
+
+def compare(report, baseline, tolerance):
+    # -> list of regressions against a previous --json report
+    problems = []
+    for name, result in report["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if not old: continue
+        now_p95, old_p95 = result["first_command_ms"]["p95"], old["first_command_ms"]["p95"]
+        if now_p95 > old_p95 * (1 + tolerance):
+            problems.append(f"{name}: first command p95 {old_p95:.1f} -> {now_p95:.1f} ms")
+        if old.get("tracker_fps") and result["tracker_fps"] is not None \
+                and result["tracker_fps"] < old["tracker_fps"] * (1 - tolerance):
+            problems.append(f"{name}: tracker {old['tracker_fps']:.1f} -> {result['tracker_fps']:.1f} fps")
+    if report["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        problems.append(f"peak RSS {baseline['peak_rss_mb']:.0f} -> {report['peak_rss_mb']:.0f} MB")
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Nemo pipeline benchmark")
+    parser.add_argument("--frames", help="image directory or video file (default: synthetic scene)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30.0, help="frame publisher rate")
+    parser.add_argument("--detector", choices=["color", "torch", "onnx", "onnx-int8"], default="color")
+    parser.add_argument("--pool", type=int, default=0, help="detector worker processes (0: in-process)")
+    parser.add_argument("--detect-cost", type=float, default=0.0, help="extra seconds per colour detector call")
+    parser.add_argument("--ttft", type=float, default=0.3, help="mock VLM time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="mock VLM delay per streamed word (s)")
+    parser.add_argument("--no-stream", action="store_true")
+    parser.add_argument("--sim-delay", type=float, default=0.0, help="motor sink delay before each ack (s)")
+    parser.add_argument("--robots", type=int, default=1, help="simulated robots driven from this process")
+    parser.add_argument("--motor-port", type=int, default=5557, help="first robot's motor port, +1 per robot")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--track-seconds", type=float, default=2.0)
+    parser.add_argument("--settle", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--trace", help="enable metrics and write the span trace (JSONL) here")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="previous --json report to check against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--transport", nargs="*", choices=["shm", "raw", "jpeg", "lz4"],
+                        help="compare frame transports instead of running the scenarios")
+    parser.add_argument("--backends", nargs="*", choices=["color", "torch", "onnx", "onnx-int8"],
+                        help="compare detector backends on the frames instead of running the scenarios")
+    parser.add_argument("--classes", nargs="+", default=["red box"], help="prompt classes for --backends")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.2)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.backends:
+        report = run_backends(args)
+        print_backends(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+        sys.exit(0)
+
+    if args.transport:
+        report = run_transports(args)
+        print_transports(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+        sys.exit(0)
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"[REGRESSION] {problem}")
+        sys.exit(1 if problems else 0)
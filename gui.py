@@ -1,113 +1,330 @@
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QLineEdit, QPushButton, QScrollArea, QLabel, QFrame, 
-                             QGraphicsOpacityEffect, QSizePolicy)
-from PyQt6.QtCore import Qt, QTimer, QPropertyAnimation, QThread, pyqtSignal
-from PyQt6.QtGui import QFont
+                             QLineEdit, QPushButton, QListView, QFrame, QLabel, 
+                             QStyledItemDelegate, QAbstractItemView)
+from PyQt6.QtCore import (Qt, QTimer, QThread, pyqtSignal, QAbstractListModel, QModelIndex,
+                          QRect, QRectF, QSize)
+from PyQt6.QtGui import QFont, QColor, QPainter, QPainterPath, QPen, QLinearGradient, QFontMetrics, QImage
+import json
+import time
 import sys
 import os
-import sounddevice
-import speech_recognition as sr
-from faster_whisper import WhisperModel
+
+from scripts.stt import SpeechService
 
 # ========================================================
 # REAL WHISPER STT WORKER
 # ========================================================
 class STTWorker(QThread):
+    # One listening session on the resident SpeechService, no model load per press
     text_ready = pyqtSignal(str)
+    partial_text = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, service):
         super().__init__()
+        self.service = service
         self.is_running = True
-        # Use "tiny" for speed, "base" for better accuracy
-        self.model_size = "tiny" 
         
     def run(self):
-        recognizer = sr.Recognizer()
         try:
-            with sr.Microphone() as source:
-                # Adjust for ambient noise for 0.5 seconds
-                recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                
-                # Listen until silence is detected or stop() is called
-                audio = recognizer.listen(source, phrase_time_limit=10)
-                
-                if not self.is_running:
-                    return
-
-                # Save temporary audio to process with Whisper
-                with open("temp_speech.wav", "wb") as f:
-                    f.write(audio.get_wav_data())
-
-                # Load and Transcribe
-                model = WhisperModel(self.model_size, device="cpu", compute_type="int8")
-                segments, info = model.transcribe("temp_speech.wav", beam_size=5)
-                
-                text = " ".join([segment.text for segment in segments])
-                self.text_ready.emit(text.strip())
-                
+            text = self.service.listen(on_partial=self.partial_text.emit,
+                                       should_stop=lambda: not self.is_running)
+            if self.is_running:
+                self.text_ready.emit(text)
         except Exception as e:
             self.error_occurred.emit(str(e))
-        finally:
-            if os.path.exists("temp_speech.wav"):
-                os.remove("temp_speech.wav")
 
     def stop(self):
         self.is_running = False
 
 class ResponseWorker(QThread):
-    finished = pyqtSignal(str)
+    # Signals carry the worker, each reply streams into its own bubble (`reply`, a ChatModel row)
+    finished = pyqtSignal(object, str)
+    partial = pyqtSignal(object, str)
 
     def __init__(self, callback, text, file_path):
         super().__init__()
         self.callback = callback
         self.text = text
         self.file_path = file_path
+        self.reply = None
 
     def run(self):
-        response = self.callback(self.text, self.file_path)
-        self.finished.emit(response)
+        response = self.callback(self.text, self.file_path, lambda text: self.partial.emit(self, text))
+        self.finished.emit(self, response)
 
-class ChatBubble(QFrame):
-    def __init__(self, text, is_user=True):
+# ========================================================
+# VIRTUALIZED CHAT HISTORY
+# ========================================================
+class ChatModel(QAbstractListModel):
+    # Keeps at most `max_messages` rows in memory. Rows leaving the front are
+    # appended to a JSONL archive (byte offsets kept in memory) and paged back
+    # in by load_older() when the view scrolls to the top.
+    def __init__(self, max_messages=500, page_size=100, history_file=".cache/chat_history.jsonl"):
         super().__init__()
-        self.layout = QHBoxLayout(self)
-        self.layout.setContentsMargins(5, 5, 5, 5)
-        
-        self.bubble = QLabel(text)
-        self.bubble.setWordWrap(True)
-        self.bubble.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
-        self.bubble.setMaximumWidth(350) 
-        self.bubble.setContentsMargins(15, 12, 15, 12)
-        
-        self.opacity_effect = QGraphicsOpacityEffect(self)
-        self.setGraphicsEffect(self.opacity_effect)
-        self.opacity_effect.setOpacity(0)
-
-        if is_user:
-            self.bubble.setStyleSheet("""
-                background-color: qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 #76b900, stop:1 #5da200);
-                color: white; border-radius: 15px; border-bottom-right-radius: 2px;
-                font-family: 'Segoe UI'; font-size: 13px; font-weight: 500;
-            """)
-            self.layout.addStretch()
-            self.layout.addWidget(self.bubble)
+        self.max_messages = max_messages
+        self.page_size = page_size
+        self.history_file = history_file
+        os.makedirs(os.path.dirname(history_file) or ".", exist_ok=True)
+        open(history_file, "w").close()
+        self.rows = []       # dicts: text, is_user, born, sizes
+        self.start = 0       # global index of rows[0]
+        self.offsets = []    # byte offset of every archived message
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        if role == Qt.ItemDataRole.DisplayRole: return self.rows[index.row()]["text"]
+        if role == Qt.ItemDataRole.UserRole: return self.rows[index.row()]
+        return None
+
+    def add(self, text, is_user):
+        row = len(self.rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.rows.append({"text": text, "is_user": is_user, "born": time.monotonic(), "sizes": {}})
+        self.endInsertRows()
+        self._trim()
+        return len(self.rows) - 1
+
+    def row_of(self, item):
+        # Streaming replies keep their row dict, usually one of the last rows
+        for row in range(len(self.rows) - 1, -1, -1):
+            if self.rows[row] is item: return row
+        return None
+
+    def set_text(self, item, text):
+        # Rows archived or cleared in the meantime are left alone
+        row = self.row_of(item)
+        if row is None: return
+        # Only this row repaints; the delegate asks for a relayout when its height changes
+        item["text"] = text
+        item["sizes"].clear()
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def _trim(self):
+        # Trimmed a page at a time so appends do not relayout the view every message
+        if len(self.rows) <= self.max_messages + self.page_size: return
+        excess = len(self.rows) - self.max_messages
+        with open(self.history_file, "a", encoding="utf-8") as f:
+            for i, item in enumerate(self.rows[:excess]):
+                # Only rows never archived before are written, reloaded pages already are
+                if self.start + i == len(self.offsets):
+                    self.offsets.append(f.tell())
+                    f.write(json.dumps({"text": item["text"], "is_user": item["is_user"]}) + "\n")
+        self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+        del self.rows[:excess]
+        self.start += excess
+        self.endRemoveRows()
+
+    def has_older(self):
+        return self.start > 0
+
+    def load_older(self):
+        # Qt's fetchMore pages in at the bottom, history grows at the top so it is done by hand
+        count = min(self.page_size, self.start)
+        if count == 0: return 0
+        first = self.start - count
+        page = []
+        with open(self.history_file, "r", encoding="utf-8") as f:
+            f.seek(self.offsets[first])
+            for _ in range(count):
+                entry = json.loads(f.readline())
+                page.append({"text": entry["text"], "is_user": entry["is_user"], "born": 0.0, "sizes": {}})
+        self.beginInsertRows(QModelIndex(), 0, count - 1)
+        self.rows[:0] = page
+        self.start = first
+        self.endInsertRows()
+        return count
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows, self.start, self.offsets = [], 0, []
+        open(self.history_file, "w").close()
+        self.endResetModel()
+
+class ChatDelegate(QStyledItemDelegate):
+    # Paints bubbles directly, only rows in the viewport are ever drawn
+    FADE = 0.4
+    PAD_X, PAD_Y, MARGIN, SPACING, RADIUS = 15, 12, 5, 15, 15
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.font = QFont("Segoe UI")
+        self.font.setPixelSize(13)
+        self.user_font = QFont(self.font)
+        self.user_font.setWeight(QFont.Weight.Medium)
+        view.model().dataChanged.connect(self._rows_changed)
+
+    @staticmethod
+    def _item(index):
+        # The row dict itself: data(UserRole) hands out a converted copy, which would drop the size cache
+        return index.model().rows[index.row()]
+
+    def _max_text_width(self):
+        return max(80, min(350, self.view.viewport().width() - 40)) - 2 * self.PAD_X
+
+    def _text_rect(self, item):
+        width = self._max_text_width()
+        if width not in item["sizes"]:
+            metrics = QFontMetrics(self.user_font if item["is_user"] else self.font)
+            item["sizes"][width] = metrics.boundingRect(QRect(0, 0, width, 100000),
+                                                        Qt.TextFlag.TextWordWrap, item["text"])
+        return item["sizes"][width]
+
+    def sizeHint(self, option, index):
+        item = self._item(index)
+        item["height"] = self._text_rect(item).height()
+        return QSize(option.rect.width(), item["height"] + 2 * (self.PAD_Y + self.MARGIN) + self.SPACING)
+
+    def _rows_changed(self, top, bottom, roles=()):
+        # A streamed token usually stays on the same line, only a new line relays out the view
+        for row in range(top.row(), bottom.row() + 1):
+            index = top.siblingAtRow(row)
+            item = self._item(index)
+            if item.get("height") != self._text_rect(item).height():
+                self.sizeHintChanged.emit(index)
+
+    @staticmethod
+    def opacity(item):
+        return min(1.0, (time.monotonic() - item["born"]) / ChatDelegate.FADE)
+
+    def _bubble_path(self, rect, is_user):
+        # Rounded bubble with a sharp tail corner at the bottom (right for the user, left for Jarvis)
+        r = self.RADIUS
+        bl, br = (r, 2) if is_user else (2, r)
+        path = QPainterPath()
+        path.moveTo(rect.left() + r, rect.top())
+        path.arcTo(QRectF(rect.right() - 2 * r, rect.top(), 2 * r, 2 * r), 90, -90)
+        path.arcTo(QRectF(rect.right() - 2 * br, rect.bottom() - 2 * br, 2 * br, 2 * br), 0, -90)
+        path.arcTo(QRectF(rect.left(), rect.bottom() - 2 * bl, 2 * bl, 2 * bl), 270, -90)
+        path.arcTo(QRectF(rect.left(), rect.top(), 2 * r, 2 * r), 180, -90)
+        path.closeSubpath()
+        return path
+
+    def paint(self, painter, option, index):
+        item = self._item(index)
+        text_rect = self._text_rect(item)
+        w, h = text_rect.width() + 2 * self.PAD_X, text_rect.height() + 2 * self.PAD_Y
+        row = option.rect
+        x = row.right() - self.MARGIN - w if item["is_user"] else row.left() + self.MARGIN
+        bubble = QRectF(x, row.top() + self.MARGIN, w, h)
+
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setOpacity(self.opacity(item))
+        path = self._bubble_path(bubble, item["is_user"])
+
+        if item["is_user"]:
+            gradient = QLinearGradient(bubble.topLeft(), bubble.bottomRight())
+            gradient.setColorAt(0, QColor("#76b900"))
+            gradient.setColorAt(1, QColor("#5da200"))
+            painter.fillPath(path, gradient)
+            painter.setFont(self.user_font)
         else:
-            self.bubble.setStyleSheet("""
-                background-color: #2a2a2a; color: #ffffff; border: 1px solid #76b900;
-                border-radius: 15px; border-bottom-left-radius: 2px;
-                font-family: 'Segoe UI'; font-size: 13px;
-            """)
-            self.layout.addWidget(self.bubble)
-            self.layout.addStretch()
+            painter.fillPath(path, QColor("#2a2a2a"))
+            painter.setPen(QPen(QColor("#76b900"), 1))
+            painter.drawPath(path)
+            painter.setFont(self.font)
+
+        painter.setPen(QColor("#ffffff"))
+        painter.drawText(bubble.adjusted(self.PAD_X, self.PAD_Y, -self.PAD_X, -self.PAD_Y),
+                         Qt.TextFlag.TextWordWrap, item["text"])
+        painter.restore()
+
+# ========================================================
+# EMBEDDED VISION PANEL
+# ========================================================
+class VisionPanel(QWidget):
+    # Wraps the shared-memory frame in a QImage (no copy) and repaints only
+    # when the ring publishes a new frame id. Overlays are plain QPainter calls.
+    closed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.frames = None
+        self.overlay = lambda: None
+        self.last_id = 0
+        self.setMinimumHeight(200)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.setToolTip("Click to close the vision (stops following)")
+
+        self.poll = QTimer(self)
+        self.poll.setInterval(15)
+        self.poll.timeout.connect(self._check_frame)
+
+    def set_frame_source(self, frames, overlay=None):
+        self.frames = frames
+        if overlay is not None: self.overlay = overlay
+
+    def showEvent(self, event):
+        self.poll.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.poll.stop()
+        super().hideEvent(event)
+
+    def mousePressEvent(self, event):
+        self.closed.emit()
+
+    def _check_frame(self):
+        # Reading the header id is a few bytes, the repaint happens only on change
+        if self.frames is not None and self.frames.latest_id() != self.last_id:
+            self.update()
+
+    def _target_rect(self, w, h):
+        scale = min(self.width() / w, self.height() / h)
+        tw, th = w * scale, h * scale
+        return QRectF((self.width() - tw) / 2, (self.height() - th) / 2, tw, th), scale
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#000000"))
+        frame = self.frames.latest() if self.frames is not None else None
+        if frame is None:
+            painter.setPen(QColor("#76b900"))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Waiting for camera...")
+            return
+
+        self.last_id = frame.frame_id
+        image = frame.image
+        h, w = image.shape[:2]
+        qimage = QImage(image.data, w, h, image.strides[0], QImage.Format.Format_BGR888)
+        target, scale = self._target_rect(w, h)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.drawImage(target, qimage)
+
+        overlay = self.overlay()
+        if overlay:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            color = QColor("#00ff00") if overlay["source"] == "detect" else QColor("#00c8ff")
+            if overlay["box"] is not None:
+                x1, y1, x2, y2 = overlay["box"]
+                painter.setPen(QPen(color, 2))
+                painter.drawRect(QRectF(target.left() + x1 * scale, target.top() + y1 * scale,
+                                        (x2 - x1) * scale, (y2 - y1) * scale))
+                painter.drawText(int(target.left() + x1 * scale), int(target.top() + y1 * scale) - 4,
+                                 f"{overlay['label']} {overlay['score']:.2f} [{overlay['source']}]")
+            if overlay["point"] is not None:
+                px, py = overlay["point"]
+                painter.setPen(Qt.PenStyle.NoPen)
+                painter.setBrush(QColor("#ffff00"))
+                painter.drawEllipse(QRectF(target.left() + px * scale - 5, target.top() + py * scale - 5, 10, 10))
 
 class JarvisInference(QWidget):
-    def __init__(self, on_message_callback):
+    def __init__(self, on_message_callback, stt_config=None, chat_config=None, on_clear=None):
         super().__init__()
         self.on_message_callback = on_message_callback
+        self.on_clear = on_clear  # forgets the model-side history along with the view
+        self.chat_model = ChatModel(**(chat_config or {}))
+        # Loaded in the background by the caller (or lazily on first use)
+        self.stt_service = SpeechService(**(stt_config or {}))
         self.current_file = None
-        self.anims = []
-        self.worker = None
+        self.workers = set()  # replies still running, several can stream at once
         self.stt_worker = None
         self.is_listening = False
         self.init_ui()
@@ -128,25 +345,39 @@ class JarvisInference(QWidget):
         self.top_bar.addWidget(self.settings_btn)
         self.top_bar.addWidget(self.volume_btn)
         self.top_bar.addStretch()
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("color: #888; font-size: 11px;")
+        self.top_bar.addWidget(self.status_label)
         self.main_layout.addLayout(self.top_bar)
 
+        # --- VISION PANEL (hidden until *vision* or *target*) ---
+        self.vision_panel = VisionPanel()
+        self.vision_panel.setFixedHeight(300)
+        self.vision_panel.hide()
+        self.main_layout.addWidget(self.vision_panel)
+
         # --- CHAT BOX ---
         self.chat_box = QFrame()
         self.chat_box.setStyleSheet("background-color: #121212; border: 1px solid #222; border-radius: 25px;")
         self.chat_box_layout = QVBoxLayout(self.chat_box)
         
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
+        self.scroll = QListView()
+        self.scroll.setModel(self.chat_model)
+        self.scroll.setItemDelegate(ChatDelegate(self.scroll))
+        self.scroll.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.scroll.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.scroll.setResizeMode(QListView.ResizeMode.Adjust)
+        self.scroll.setFocusPolicy(Qt.FocusPolicy.NoFocus)
         self.scroll.setStyleSheet("border: none; background: transparent;")
+        self.scroll.verticalScrollBar().valueChanged.connect(self._maybe_load_older)
         self._style_scrollbar()
-        
-        self.container = QWidget()
-        self.container.setStyleSheet("background: transparent;")
-        self.chat_layout = QVBoxLayout(self.container)
-        self.chat_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.chat_layout.setSpacing(15)
-        
-        self.scroll.setWidget(self.container)
+
+        # One shared timer drives fade-ins, it stops as soon as nothing is animating
+        self.fade_timer = QTimer(self)
+        self.fade_timer.setInterval(16)
+        self.fade_timer.timeout.connect(self._animate)
+
         self.chat_box_layout.addWidget(self.scroll)
         self.main_layout.addWidget(self.chat_box)
 
@@ -177,6 +408,18 @@ class JarvisInference(QWidget):
         self.input_layout.addWidget(self.send_btn)
         self.main_layout.addWidget(self.input_container)
 
+    def set_status(self, status):
+        # {"detector": "pending" | "ready" | "failed", ...} -> coloured dots
+        colors = {"pending": "#f0a000", "ready": "#76b900", "failed": "#ff4444"}
+        html = "  ".join(f"<span style='color:{colors.get(state, '#888')}'>●</span> {name}"
+                         for name, state in status.items())
+        if html != self.status_label.text():
+            self.status_label.setText(html)
+
+    def set_vision_visible(self, visible):
+        if visible != self.vision_panel.isVisible():
+            self.vision_panel.setVisible(visible)
+
     def _create_icon_btn(self, icon, tip, func):
         btn = QPushButton(icon)
         btn.setFixedSize(35, 35)
@@ -190,7 +433,8 @@ class JarvisInference(QWidget):
             self.is_listening = True
             self.mic_btn.setStyleSheet("QPushButton { background-color: #ff4444; color: white; font-size: 18px; border-radius: 20px; }")
             self.input_field.setPlaceholderText("Listening...")
-            self.stt_worker = STTWorker()
+            self.stt_worker = STTWorker(self.stt_service)
+            self.stt_worker.partial_text.connect(self.show_partial_stt)
             self.stt_worker.text_ready.connect(self.fill_stt_text)
             self.stt_worker.error_occurred.connect(lambda e: print(f"STT Error: {e}"))
             self.stt_worker.start()
@@ -204,6 +448,10 @@ class JarvisInference(QWidget):
         if self.stt_worker:
             self.stt_worker.stop()
 
+    def show_partial_stt(self, text):
+        if self.is_listening and text:
+            self.input_field.setText(text)
+
     def fill_stt_text(self, text):
         if text:
             self.input_field.setText(text)
@@ -246,31 +494,57 @@ class JarvisInference(QWidget):
             self.input_field.setPlaceholderText("Thinking...")
             self.current_file = None
             
-            self.worker = ResponseWorker(self.on_message_callback, text, file_to_send)
-            self.worker.finished.connect(self.display_response)
-            self.worker.start()
+            worker = ResponseWorker(self.on_message_callback, text, file_to_send)
+            worker.partial.connect(self.display_partial)
+            worker.finished.connect(self.display_response)
+            self.workers.add(worker)
+            worker.start()
 
-    def display_response(self, response_text):
-        self.add_message(response_text, False)
-        self.input_field.setPlaceholderText("Type a message...")
+    def display_partial(self, worker, text):
+        # Grow this reply's bubble token by token
+        if worker.reply is None:
+            worker.reply = self.chat_model.rows[self.add_message(text.lstrip(), False)]
+        else:
+            self.chat_model.set_text(worker.reply, worker.reply["text"] + text)
+            self._scroll_to_bottom()
+
+    def display_response(self, worker, response_text):
+        if worker.reply is not None:
+            self.chat_model.set_text(worker.reply, response_text)
+        else:
+            self.add_message(response_text, False)
+        worker.wait()  # run() returns right after the signal, the thread must end before it is dropped
+        self.workers.discard(worker)
+        if not self.workers:
+            self.input_field.setPlaceholderText("Type a message...")
+
+    def _scroll_to_bottom(self):
+        QTimer.singleShot(0, self.scroll.scrollToBottom)
+
+    def _maybe_load_older(self, value):
+        bar = self.scroll.verticalScrollBar()
+        if value != bar.minimum() or not self.chat_model.has_older(): return
+        # Keep the message under the cursor in place while the page is prepended
+        before = bar.maximum()
+        if self.chat_model.load_older():
+            self.scroll.doItemsLayout()
+            bar.setValue(bar.maximum() - before)
+
+    def _animate(self):
+        rows = self.chat_model.rows
+        if rows and ChatDelegate.opacity(rows[-1]) < 1.0:
+            self.scroll.viewport().update()
+        else:
+            self.fade_timer.stop()
+            self.scroll.viewport().update()
 
     def add_message(self, text, is_user):
-        bubble = ChatBubble(text, is_user)
-        self.chat_layout.addWidget(bubble)
-        self.container.adjustSize()
-        
-        QTimer.singleShot(100, lambda: self.scroll.verticalScrollBar().setValue(
-            self.scroll.verticalScrollBar().maximum()
-        ))
-        
-        fade = QPropertyAnimation(bubble.opacity_effect, b"opacity")
-        fade.setDuration(400)
-        fade.setStartValue(0.0)
-        fade.setEndValue(1.0)
-        fade.start()
-        self.anims.append(fade)
+        row = self.chat_model.add(text, is_user)
+        self._scroll_to_bottom()
+        if not self.fade_timer.isActive():
+            self.fade_timer.start()
+        return row
 
     def clear_chat(self):
-        while self.chat_layout.count():
-            item = self.chat_layout.takeAt(0)
-            if item.widget(): item.widget().deleteLater()
\ No newline at end of file
+        self.chat_model.clear()
+        if self.on_clear: self.on_clear()
@@ -1,41 +1,141 @@
-from multiprocessing import shared_memory
+import time
+LAUNCH = time.perf_counter()
+
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import QTimer
-from ultralytics import YOLOE
-import numpy as np
-import cv2
+import queue
 import sys
-import os
 import re
 
 # Local Imports
+from scripts.startup import StartupProfile, Loader
+from scripts import metrics
+profile = StartupProfile(LAUNCH)
+profile.mark("qt imported")
+
 import scripts.commands as robot
+from scripts.robots import RobotRegistry, robot_entries
+from scripts.framering import FrameReader
+from scripts.media import encode_latest, describe
+from scripts.attachments import AttachmentProcessor
+from scripts.conversation import Conversation, count_tokens
+from scripts.response_cache import ResponseCache, dhash
+from scripts.intents import IntentParser
 from gui import JarvisInference
 from nim import Nvidia
+from scripts.nim_client import NimError, NimRateLimited, NimTimeout, NimAuthError
+profile.mark("modules imported")
 
 # =========================
 # CONFIG & INITIALIZATION
 # =========================
 nv = Nvidia(config_path="config.yaml")
-model = YOLOE("models/yoloe.pt")
-VISION_WINDOW = "Jarvis Vision"
-META_FILE = "scripts/Apdata.txt"
+metrics.configure(**(nv.config.get("metrics") or {}))
+robot.tracking_config.update(nv.config.get("tracking") or {})
+robot.follow_config.update(nv.config.get("follow") or {})
+embedding_cfg = nv.config.get("embeddings") or {}
+detector_cfg = nv.config.get("detector") or {}
+pool_cfg = nv.config.get("detector_pool") or {}
+batch_cfg = nv.config.get("batching") or {}
+stream_cfg = nv.config.get("frame_stream") or {}
+
+# Every Carter in the `robots` section, each with its own frames, motors and dialogue
+robots = RobotRegistry(robot_entries(nv.config))
+
+# Filled in by the background loader, everything below copes with them being None
+detector = None
+pool = None
+batcher = None
+loader = Loader(profile)
+notices = queue.SimpleQueue()  # messages from background threads, shown in the chat by the GUI timer
+
+def LoadDetector(instance=None):
+    # instance: an already built backend (benchmark.py's stand-in), used in-process as is
+    global detector, pool, batcher
+    if instance is None and pool_cfg.get("workers", 0) > 0:
+        # The detector runs in worker processes reading the frame ring, this process never imports it
+        from scripts.detector_pool import DetectorPool
+        pool = DetectorPool(cache_dir=embedding_cfg.get("cache_dir", "models/embeddings"),
+                            detector=detector_cfg, **pool_cfg).start()
+        if not pool.wait_ready():
+            raise RuntimeError("detector workers did not start")
+        return
+    # torch / onnxruntime imports alone take seconds, keep them off the GUI path
+    detector = instance
+    if detector is None:
+        from scripts.detectors import create_detector
+        detector = create_detector(cache_dir=embedding_cfg.get("cache_dir", "models/embeddings"),
+                                   capacity=embedding_cfg.get("capacity", 64), **detector_cfg)
+    if len(robots) > 1:
+        # Several cameras, one forward pass
+        from scripts.detector_batch import BatchDetector
+        batcher = BatchDetector(detector, **batch_cfg).start()
+
+def WarmDetector():
+    # Preload common prompt classes once the detector exists (text embeddings, or the ONNX session)
+    if detector is None: return
+    detector.warmup(embedding_cfg.get("warmup", []))
+
+def AttachFrames(bot):
+    if stream_cfg.get("enabled"):
+        # nemo.py on another host: frames arrive over the network into a local ring
+        from scripts.framenet import NetFrameReader
+        bot.frames = NetFrameReader.connect(bot.stream_address, bot.meta_file, bot.notify_address)
+    else:
+        bot.frames = FrameReader.attach(bot.meta_file)  # raises until nemo.py has published the ring
+    print(f"[OK] Shared memory connected: {bot.frames.name} ({bot.name})")
+
+def WaitSimulator(bot):
+    if not bot.motor.connected:
+        raise ConnectionError(f"Isaac Sim not answering yet ({bot.name})")
+
+def StageName(stage, bot):
+    # "camera" with one robot, "camera:carter2" with several
+    return stage if len(robots) == 1 else f"{stage}:{bot.name}"
+
+def Startup(speech=None):
+    # Heavy work runs in parallel in the background, the window shows immediately
+    loader.submit("detector", LoadDetector)
+    loader.when_ready("detector", lambda: loader.submit("embeddings", WarmDetector))
+    robots.connect()
+    for bot in robots:
+        loader.submit(StageName("camera", bot), lambda bot=bot: AttachFrames(bot), retry_every=1.0)
+        loader.submit(StageName("simulator", bot), lambda bot=bot: WaitSimulator(bot), retry_every=0.5)
+    if speech is not None:
+        loader.submit("speech", speech.load)
 
-memory = []
-shm = None
-frame = None
+# Frame encoding for VLM requests (resolution / quality the model actually uses)
+vision_cfg = {"max_width": 768, "max_height": 576, "quality": 80, "fmt": "jpeg"}
+vision_cfg.update(nv.config.get("vision") or {})
 
-# Connect Robot ZMQ
-robot.connect_zmq("tcp://localhost:5555")
+# Persona is sent once as a stable system prefix, older turns get summarized
+SUMMARY_PROMPT = ("You condense robot operator conversations. Summarize the transcript in a few sentences, "
+                  "keeping names, targets, places and any pending requests. Reply with the summary only.")
 
-if os.path.exists(META_FILE):
-    with open(META_FILE, "r") as f:
-        name, H, W, C, dtype_str = [f.readline().strip() for _ in range(5)]
-    shm = shared_memory.SharedMemory(name=name)
-    frame = np.ndarray((int(H), int(W), int(C)), dtype=np.dtype(dtype_str), buffer=shm.buf)
-    print(f"[OK] Shared memory connected: {name}")
+def Summarize(transcript):
+    return nv.ask(transcript, memory=[{"role": "system", "content": SUMMARY_PROMPT}])
 
-if not os.path.exists("vision"): os.makedirs("vision")
+# Dropped files are reduced to keyframes / text within a fixed budget
+attachments = AttachmentProcessor(**(nv.config.get("attachments") or {}))
+
+# Unambiguous motion requests skip the VLM, command names come from config.txt
+intent_cfg = {"enabled": True, "log": False}
+intent_cfg.update(nv.config.get("intents") or {})
+
+def Dialogue(bot):
+    # One conversation per robot, the HTTP client underneath is shared
+    bot.memory = Conversation(nv.persona, summarizer=Summarize, **(nv.config.get("conversation") or {}))
+    bot.intents = IntentParser(nv.persona, is_moving=bot.scheduler.moving, log=intent_cfg["log"])
+    bot.notify = notices.put
+
+for bot in robots: Dialogue(bot)
+
+def ClearHistory():
+    # "Erase history" in the GUI: the chat view shows every robot, so every conversation is forgotten
+    for bot in robots: bot.memory.clear()
+
+# Repeated questions about an unchanged view are answered locally (off by default)
+response_cache = ResponseCache(**(nv.config.get("response_cache") or {}))
 
 # =========================
 # CLEAN PARSERS
@@ -46,56 +146,192 @@ def CommandExtractor(text):
     clean_text = ' '.join(clean_text.split())
     return commands, clean_text
 
-def CommandHandler(cmd):
+class StreamCommandParser:
+    # Incremental CommandExtractor: commands come out as soon as their closing asterisk arrives
+    def __init__(self):
+        self.text = ""
+        self.in_command = False
+        self.pending = ""
+        self.commands = []
+
+    def feed(self, delta):
+        text, commands = "", []
+        for ch in delta:
+            if ch == "*":
+                if self.in_command:
+                    commands.append(self.pending)
+                    self.pending = ""
+                self.in_command = not self.in_command
+            elif self.in_command:
+                self.pending += ch
+            else:
+                text += ch
+        self.text += text
+        self.commands.extend(commands)
+        return text, commands
+
+    def finish(self):
+        # An unmatched asterisk is plain text, like in CommandExtractor
+        if self.in_command:
+            self.text += "*" + self.pending
+            self.in_command, self.pending = False, ""
+        return ' '.join(self.text.split())
+
+def ApiErrorMessage(error):
+    if isinstance(error, NimRateLimited): return "⚠ The language model is rate limiting us, try again in a moment."
+    if isinstance(error, NimTimeout): return "⚠ The language model took too long to answer."
+    if isinstance(error, NimAuthError): return "⚠ The API key was rejected, check config.yaml."
+    return f"⚠ Language model unavailable: {error}"
+
+SPEEDS = {"forward": (5, 5), "backward": (-5, -5), "left": (2, -2), "right": (-2, 2)}
+
+def MotionStep(cmd, bot):
+    # "forward 2" -> (5, 5, 2.0), None for anything that is not a drive command
+    parts = cmd.split()
+    if not parts or parts[0].lower() not in SPEEDS: return None
+    try:
+        duration = float(parts[1]) if len(parts) > 1 else None
+    except ValueError:
+        duration = None
+    bot.memory.set_state("motion", parts[0].lower() if duration is None else f"{parts[0].lower()} for {duration:g}s")
+    return (*SPEEDS[parts[0].lower()], duration)
+
+class MotionPlan:
+    # Drive commands of one reply run in order: the first replaces whatever was
+    # running, later ones queue behind it instead of cancelling it
+    def __init__(self, bot):
+        self.bot = bot
+        self.token = None
+
+    def add(self, steps):
+        if self.token is None or not self.bot.scheduler.append(self.token, steps):
+            self.token = self.bot.execute_plan(steps)
+
+def RunCommands(commands, plan):
+    # Consecutive drive commands reach the scheduler as one sequence
+    steps = []
+    for cmd in commands:
+        step = MotionStep(cmd, plan.bot)
+        if step is not None:
+            steps.append(step)
+            continue
+        if steps: plan.add(steps)
+        steps = []
+        CommandHandler(cmd, plan)
+    if steps: plan.add(steps)
+
+def CommandHandler(cmd, plan=None, bot=None):
     parts = cmd.split()
     if not parts: return
     name = parts[0].lower()
+    bot = bot or (plan.bot if plan else robots.selected)
 
-    if name in ["forward", "backward", "left", "right"]:
-        try:
-            duration = float(parts[1]) if len(parts) > 1 else None
-        except:
-            duration = None
-            
-        speeds = {"forward": (5, 5), "backward": (-5, -5), "left": (2, -2), "right": (-2, 2)}
-        robot.execute_motion(*speeds[name], duration)
+    if name in SPEEDS:
+        (plan or MotionPlan(bot)).add([MotionStep(cmd, bot)])
 
     elif name == "speed":
         modifier = parts[1] if len(parts) > 1 else "+"
-        factor = 2.0 if modifier == "+" else 0.5
-        robot.execute_motion(robot.last_left * factor, robot.last_right * factor)
+        bot.scale_speed(2.0 if modifier == "+" else 0.5)
 
     elif name == "stop":
-        with robot.target_lock: robot.target_id += 1 
-        robot.current_annotated_frame = None
-        robot.execute_motion(0, 0)
+        bot.stop_tracking()
+        bot.scheduler.cancel()
+        bot.memory.set_state("motion", "stopped")
+        bot.memory.set_state("target", None)
 
     elif name == "vision":
-        robot.vision_enabled = True
+        bot.vision_enabled = True
 
     elif name == "target":
         target_class = ' '.join(parts[1:]) if len(parts) > 1 else "person"
-        robot.execute_target(target_class, frame, model)
+        if not loader.ready("detector"): print("[STARTUP] Detector still loading, target queued")
+        bot.memory.set_state("target", f"following {target_class}")
+        bot.memory.set_state("motion", "tracking")
+
+        # A stop or another target while the detector is still loading replaces this one
+        bot.stop_tracking()
+        queued = bot.target_id
+
+        def start():
+            if bot.target_id == queued:
+                bot.execute_target(target_class, bot.frames, detector, pool=pool, batcher=batcher)
+
+        def failed(error):
+            if bot.target_id != queued: return
+            bot.memory.set_state("target", None)
+            bot.memory.set_state("motion", "stopped")
+            notices.put(f"⚠ Cannot follow the {target_class}: the detector failed to load ({error}).")
+        loader.when_ready("detector", start, failed)
 
 # =========================
 # INFERENCE LOGIC
 # =========================
-def Process(prompt, file):
-    global memory
+def Process(prompt, file, on_delta=None):
+    start = time.monotonic()
+    # "@carter2 ..." talks to another robot, plain prompts go to the last one addressed
+    bot, prompt = robots.resolve(prompt)
+    memory, intents, frames = bot.memory, bot.intents, bot.frames
+
+    # Fast path: "stop", "forward 3", "follow the person" run in milliseconds
+    intent = intents.parse(prompt) if intent_cfg["enabled"] and not file else None
+    if intent_cfg["enabled"]: intents.record(intent is not None)
+    if intent is not None:
+        commands, reply = intent
+        RunCommands(commands, MotionPlan(bot))
+        memory.add_turn(prompt, reply)
+        if on_delta: on_delta(reply)
+        metrics.observe("turn", time.monotonic() - start)
+        return reply
+
+    frame_hash = file_hash = None
+    cacheable = response_cache.enabled
+    if cacheable and file:
+        # A folder, or a file deleted / locked since the drop: attachments.process() reports it
+        try: file_hash = attachments.content_hash(file)
+        except OSError: cacheable = False
+    if cacheable:
+        current = frames.latest() if frames is not None else None
+        frame_hash = dhash(current.image) if current is not None else None
+        cached = response_cache.get(prompt, frame_hash, file_hash)
+        if cached is not None:
+            print(f"[CACHE] hit {response_cache.stats()}")
+            if on_delta: on_delta(cached)
+            memory.add_turn(prompt, cached)
+            return cached
+
     media = []
-    if frame is not None:
-        cv2.imwrite("vision/vision.jpg", frame)
-        media.append("vision/vision.jpg")
-    if file: media.append(file)
+    with metrics.span("media_encode"):
+        encoded = encode_latest(frames, **vision_cfg) if frames is not None else None
+    if encoded is not None:
+        print(f"[MEDIA] {describe(encoded.stats)}")
+        media.append(encoded)
+    if file: media.extend(attachments.process(file))
 
-    response = nv.ask(prompt, memory=memory, media_files=media)
-    commands, clean_response = CommandExtractor(response)
-    
-    memory.append({"role": "user", "content": prompt})
-    memory.append({"role": "assistant", "content": clean_response})
+    history = memory.messages(reserve_tokens=count_tokens(prompt))
+    parser = StreamCommandParser()
+    plan = MotionPlan(bot)
+    try:
+        if nv.params['stream']:
+            # Act on each command the moment it is complete, not after the full reply
+            for delta in nv.ask_stream(prompt, memory=history, media_files=media):
+                text, commands = parser.feed(delta)
+                RunCommands(commands, plan)
+                if text and on_delta: on_delta(text)
+        else:
+            text, commands = parser.feed(nv.ask(prompt, memory=history, media_files=media))
+            RunCommands(commands, plan)
+    except NimError as e:
+        # Transport failures are reported to the operator, never stored as the bot's answer
+        print(f"[NIM ERROR] {type(e).__name__}: {e}")
+        partial = parser.finish()
+        return (partial + "\n\n" if partial else "") + ApiErrorMessage(e)
+    clean_response = parser.finish()
 
-    for cmd in commands:
-        CommandHandler(cmd)
+    memory.add_turn(prompt, clean_response)
+    if cacheable:
+        response_cache.put(prompt, frame_hash, clean_response, time.monotonic() - start,
+                           file_hash, has_commands=bool(parser.commands))
+    metrics.observe("turn", time.monotonic() - start)
 
     return clean_response
 
@@ -103,17 +339,50 @@ def Process(prompt, file):
 # MAIN LOOP
 # =========================
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    PROFILE_STARTUP = "--profile-startup" in sys.argv
+    app = QApplication([arg for arg in sys.argv if arg != "--profile-startup"])
     
-    # Bridge the GUI timer to the command vision updater
+    window = JarvisInference(on_message_callback=Process, stt_config=nv.config.get("stt"),
+                             chat_config=nv.config.get("chat"), on_clear=ClearHistory)
+    Startup(speech=window.stt_service)
+    window.vision_panel.set_frame_source(robots.selected.frames, overlay=lambda: robots.selected.current_overlay)
+    window.show()
+    profile.mark("window shown")
+
+    # *vision* / *target* only flip a flag, the panel follows it (for the selected robot)
+    def CloseVision():
+        robots.selected.vision_enabled = False
+        robots.selected.stop_tracking()
+
+    def UpdateVision():
+        window.vision_panel.set_frame_source(robots.selected.frames)
+        window.set_vision_visible(robots.selected.vision_enabled)
+
+    window.vision_panel.closed.connect(CloseVision)
     vision_timer = QTimer()
-    vision_timer.timeout.connect(lambda: robot.update_vision_system(frame, VISION_WINDOW))
-    vision_timer.start(30)
+    vision_timer.timeout.connect(UpdateVision)
+    vision_timer.start(100)
 
-    window = JarvisInference(on_message_callback=Process)
-    window.show()
+    # Readiness indicators, and the startup report once every stage has settled
+    report_printed = False
+    def UpdateStartup():
+        global report_printed
+        window.set_status(dict(loader.status))
+        while not notices.empty():
+            window.add_message(notices.get(), False)
+        if PROFILE_STARTUP and not report_printed and loader.settled() and "first interaction" in profile.marks:
+            report_printed = True
+            print(profile.report())
+
+    status_timer = QTimer()
+    status_timer.timeout.connect(UpdateStartup)
+    status_timer.start(250)
+    QTimer.singleShot(0, lambda: profile.mark("first interaction"))
 
     exit_code = app.exec()
-    if shm: shm.close()
-    cv2.destroyAllWindows()
+    if PROFILE_STARTUP and not report_printed:
+        print(profile.report() + "\n  (still pending at exit: " +
+              ", ".join(n for n, state in loader.status.items() if state == "pending") + ")")
+    if pool: pool.close()
+    robots.close()
     sys.exit(exit_code)
\ No newline at end of file
@@ -6,64 +6,114 @@ from isaacsim.core.api import World
 from isaacsim.sensors.camera import Camera
 from isaacsim.core.api.objects import DynamicCuboid
 import isaacsim.core.utils.numpy.rotations as rot_utils
-from multiprocessing import shared_memory
 import numpy as np
 import cv2
+import time
+import yaml
+
+from scripts import metrics
+from scripts.framering import FrameWriter
+from scripts.framenet import FrameSender
+from scripts.robots import robot_entries
+
+with open("config.yaml") as f:
+    config = yaml.safe_load(f) or {}
+metrics.configure(process="nemo", **(config.get("metrics") or {}))
+
+# Capture rate and optional extra channels
+capture_cfg = {"frequency": 20, "motion_vectors": False, "depth": False}
+capture_cfg.update(config.get("capture") or {})
+
+# Optional network copy of every frame, for main.py on another host
+stream_cfg = {"enabled": False, "codec": "raw", "quality": 90}
+stream_cfg.update(config.get("frame_stream") or {})
 
 # Open stage
 usd_path = "/home/nairs/Desktop/Projects/Nvidia/Nemo.usd"
 omni.usd.get_context().open_stage(usd_path)
 my_world = World(stage_units_in_meters=1.0)
 
-# Write metadata
+# One shared frame ring per robot camera (metadata lives in the segment header)
 W, H, C = 1024, 768, 3
-META_FILE = "scripts/Apdata.txt"
-shm = shared_memory.SharedMemory(create=True, size=H * W * C)
-buffer = np.ndarray((H, W, C), dtype=np.uint8, buffer=shm.buf)
-
-with open(META_FILE, "w") as f:
-    f.write(f"{shm.name}\n{H}\n{W}\n{C}\nuint8\n")
-
-
-
-# Setup
-camera = Camera(
-    prim_path="/World/carter_v1/chassis_link/camera_mount/carter_camera_first_person",
-    frequency=20,
-    resolution=(W, H),
-)
-
-
-camera.initialize()
+channels = {}
+if capture_cfg["motion_vectors"]: channels["motion_vectors"] = ((H, W, 2), np.float32)
+if capture_cfg["depth"]: channels["depth"] = ((H, W), np.float32)
+
+# Setup: [camera, frame ring, network sender, last published render] per entry of the `robots` section
+streams = []
+for entry in robot_entries(config):
+    camera = Camera(
+        prim_path=entry["camera"],
+        frequency=capture_cfg["frequency"],
+        resolution=(W, H),
+    )
+    frames = FrameWriter((H, W, C), dtype=np.uint8, slots=4, meta_file=entry["meta_file"],
+                         notify_address=entry["notify"], channels=channels)
+    sender = None
+    if stream_cfg["enabled"]:
+        sender = FrameSender(entry["stream"], codec=stream_cfg["codec"], quality=stream_cfg["quality"])
+    streams.append([camera, frames, sender, None])
+
+for camera, _, _, _ in streams:
+    camera.initialize()
 my_world.reset()
 
+# Extra annotators cost render time, only attach the ones that are published
+for camera, _, _, _ in streams:
+    if capture_cfg["motion_vectors"]: camera.add_motion_vectors_to_frame()
+    if capture_cfg["depth"]: camera.add_distance_to_image_plane_to_frame()
 
-camera.add_motion_vectors_to_frame()
-i = 0
+period = 1.0 / capture_cfg["frequency"]
+next_capture = 0.0
 
 print("==================================================================================================")
 while simulation_app.is_running():
     my_world.step(render=True)
-    camera.get_current_frame()
-    print(i)
-
 
-    if i == 100:
-        i -= 1
-        rgba = camera.get_rgba()
-        print(rgba.shape)
-        
-        bgr = cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR)
-        buffer[:] = bgr
-
-    
     if my_world.is_playing():
         if my_world.current_time_step_index == 0:
             my_world.reset()
 
-    i += 1
-
-
-shm.unlink()
+    # Publish at the camera frequency (simulation time), and only a render we have not sent yet
+    sim_time = my_world.current_time
+    if sim_time < next_capture - period:
+        next_capture = sim_time  # timeline was reset
+    if sim_time + 1e-6 < next_capture:
+        continue
+
+    published = False
+    for stream in streams:
+        camera, frames, sender, last_render = stream
+        with metrics.span("capture"):
+            current = camera.get_current_frame()
+        rgba = current.get("rgba")
+        render_id = current.get("rendering_frame")
+        if rgba is None or rgba.size == 0 or render_id == last_render:
+            continue
+        stream[3] = render_id
+        published = True
+
+        # Conversion and copies land straight in the ring slot, no temporaries
+        with metrics.span("shm_write"):
+            image = frames.begin()
+            cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR, dst=image)
+            if "motion_vectors" in channels:
+                np.copyto(frames.channel("motion_vectors"), current["motion_vectors"][..., :2])
+            if "depth" in channels:
+                np.copyto(frames.channel("depth"), current["distance_to_image_plane"])
+            extra = {name: frames.channel(name) for name in channels}
+            timestamp, sim_step = time.time(), my_world.current_time_step_index
+            frame_id = frames.commit(timestamp=timestamp, sim_step=sim_step)
+        # send() copies the slot here on the capture thread, before the ring reuses it;
+        # only the encode and publish run on the sender thread
+        if sender is not None:
+            sender.send(image, frame_id, timestamp, sim_step, extra)
+    if published:
+        next_capture = max(next_capture + period, sim_time)
+
+
+for _, frames, sender, _ in streams:
+    if sender is not None: sender.close()
+    frames.close()
 cv2.destroyAllWindows()
 simulation_app.close()
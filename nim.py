@@ -1,8 +1,14 @@
-import requests
+import json
 import os
+import time
 import base64
 import yaml
 
+from scripts import metrics
+from scripts.media import EncodedMedia
+from scripts.attachments import TextAttachment
+from scripts.nim_client import NimClient, NimRequestError
+
 class Nvidia:
     def __init__(self, config_path="config.yaml"):
         self.config = self._load_config(config_path)
@@ -18,6 +24,11 @@ class Nvidia:
         else:
             self.persona = self.persona_path # Fallback to literal string
 
+        # Shared keep-alive pool, read timeout falls back to parameters.timeout
+        http_cfg = {"read_timeout": self.params.get('timeout', 120)}
+        http_cfg.update(self.config.get('http') or {})
+        self.http = NimClient(**http_cfg)
+
         self.supported_formats = {
             "png": ["image/png", "image_url"],
             "jpg": ["image/jpeg", "image_url"],
@@ -39,12 +50,15 @@ class Nvidia:
         with open(media_file, "rb") as f:
             return base64.b64encode(f.read()).decode("utf-8")
 
-    def _prepare_content(self, query, media_files):
-        # BRUTE FORCE: Inject persona and memory context into the query text
-        injected_query = (
-            f"SYSTEM INSTRUCTIONS (ACT AS THIS PERSONA): {self.persona}\n\n"
-            f"CURRENT USER QUESTION: {query}"
-        )
+    def _prepare_content(self, query, media_files, inject_persona=True):
+        # BRUTE FORCE: Inject persona and memory context into the query text,
+        # unless the history already opens with a system prompt
+        injected_query = query
+        if inject_persona:
+            injected_query = (
+                f"SYSTEM INSTRUCTIONS (ACT AS THIS PERSONA): {self.persona}\n\n"
+                f"CURRENT USER QUESTION: {query}"
+            )
         
         if not media_files:
             return injected_query
@@ -52,6 +66,16 @@ class Nvidia:
         content = [{"type": "text", "text": injected_query}]
         for media_file in media_files:
             if not media_file: continue
+            if isinstance(media_file, EncodedMedia):
+                content.append({
+                    "type": media_file.kind,
+                    media_file.kind: {"url": media_file.data_url()}
+                })
+                continue
+            if isinstance(media_file, TextAttachment):
+                content.append({"type": "text", "text": media_file.render()})
+                continue
+
             ext = self._get_extension(media_file)
             if ext not in self.supported_formats:
                 continue
@@ -65,22 +89,22 @@ class Nvidia:
             })
         return content
 
-    def ask(self, query, memory=None, media_files=None):
+    def _build_request(self, query, memory, media_files, stream):
         if media_files is None:
             media_files = []
         if memory is None:
             memory = []
         
-        # Prepare content with the injected persona
-        current_turn_content = self._prepare_content(query, media_files)
+        # Prepare content, persona goes in the user turn only without a system message
+        has_system = bool(memory) and memory[0].get("role") == "system"
+        current_turn_content = self._prepare_content(query, media_files, inject_persona=not has_system)
         
         headers = {
             "Authorization": f"Bearer {self.api_cfg['key']}",
             "Content-Type": "application/json",
-            "Accept": "application/json" if not self.params['stream'] else "text/event-stream",
+            "Accept": "application/json" if not stream else "text/event-stream",
         }
 
-        # Emptying the system role because we injected it into the user role
         messages = []
         messages.extend(memory)
         messages.append({"role": "user", "content": current_turn_content})
@@ -93,23 +117,71 @@ class Nvidia:
             "top_p": self.params['top_p'],
             "frequency_penalty": self.params['frequency_penalty'],
             "presence_penalty": self.params['presence_penalty'],
-            "stream": self.params['stream'],
+            "stream": stream,
         }
+        return headers, payload
+
+    # Sync and async APIs raise NimError subclasses (timeouts, rate limits, auth, server errors)
+    def ask(self, query, memory=None, media_files=None):
+        if self.params['stream']:
+            return "".join(self.ask_stream(query, memory, media_files))
+
+        headers, payload = self._build_request(query, memory, media_files, stream=False)
+        with metrics.span("vlm_request", stream=False):
+            data = self.http.post_json(self.api_cfg['url'], headers, payload)
+        return self._content(data)
 
+    def ask_stream(self, query, memory=None, media_files=None):
+        # Yields text deltas as the server-sent events arrive
+        headers, payload = self._build_request(query, memory, media_files, stream=True)
+        start, first = time.perf_counter(), True
+        with metrics.span("vlm_request", stream=True):
+            for line in self.http.stream_lines(self.api_cfg['url'], headers, payload):
+                delta, done = self._parse_event(line)
+                if done: break
+                if delta:
+                    if first:
+                        metrics.observe("vlm_first_token", time.perf_counter() - start)
+                        first = False
+                    yield delta
+
+    async def aask(self, query, memory=None, media_files=None):
+        if self.params['stream']:
+            return "".join([delta async for delta in self.aask_stream(query, memory, media_files)])
+
+        headers, payload = self._build_request(query, memory, media_files, stream=False)
+        with metrics.span("vlm_request", stream=False):
+            data = await self.http.apost_json(self.api_cfg['url'], headers, payload)
+        return self._content(data)
+
+    async def aask_stream(self, query, memory=None, media_files=None):
+        headers, payload = self._build_request(query, memory, media_files, stream=True)
+        start, first = time.perf_counter(), True
+        with metrics.span("vlm_request", stream=True):
+            async for line in self.http.astream_lines(self.api_cfg['url'], headers, payload):
+                delta, done = self._parse_event(line)
+                if done: break
+                if delta:
+                    if first:
+                        metrics.observe("vlm_first_token", time.perf_counter() - start)
+                        first = False
+                    yield delta
+
+    def _content(self, data):
         try:
-            response = requests.post(
-                self.api_cfg['url'], 
-                headers=headers, 
-                json=payload, 
-                timeout=self.params['timeout']
-            )
-            response.raise_for_status()
-            
-            if self.params['stream']:
-                return response.iter_lines()
-            else:
-                data = response.json()
-                return data['choices'][0]['message']['content']
-                
-        except Exception as e:
-            return f"Nvidia API Error: {e}"
\ No newline at end of file
+            return data['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise NimRequestError(f"Unexpected response: {str(data)[:200]}")
+
+    def _parse_event(self, line):
+        # -> (text delta or None, stream finished)
+        if not line or not line.startswith("data:"):
+            return None, False
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None, True
+        try:
+            choices = json.loads(data).get("choices") or []
+            return (choices[0].get("delta", {}).get("content") if choices else None), False
+        except (ValueError, AttributeError, IndexError):
+            raise NimRequestError(f"Malformed stream event: {data[:100]}")
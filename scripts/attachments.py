@@ -0,0 +1,204 @@
+from collections import OrderedDict
+import hashlib
+import html
+import json
+import os
+import re
+import zipfile
+import cv2
+
+from scripts.media import EncodedMedia, encode_frame
+
+# =========================
+# ATTACHMENT PARTS
+# =========================
+class TextAttachment:
+    # Extracted document text, sent as an extra text part of the user turn
+    __slots__ = ("name", "text")
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+
+    def render(self):
+        return f"ATTACHED FILE ({self.name}):\n{self.text}"
+
+IMAGE_EXT = {"png", "jpg", "jpeg", "webp", "bmp", "tif", "tiff"}
+VIDEO_EXT = {"mp4", "webm", "mov", "avi", "mkv", "m4v"}
+TEXT_EXT = {"txt", "md", "csv", "json", "yaml", "yml", "log", "py", "xml", "html", "ini", "cfg"}
+CHUNK = 1 << 20
+
+# =========================
+# PREPROCESSOR
+# =========================
+class AttachmentProcessor:
+    # Turns a dropped file into a bounded list of parts (EncodedMedia / TextAttachment).
+    # Files are hashed and decoded in chunks or frame by frame so peak memory
+    # does not depend on the input size, and results are cached by content hash.
+    def __init__(self, cache_dir=".cache/attachments", max_frames=8, max_width=640, max_height=480,
+                 quality=75, max_text_chars=20000, memory_entries=16, hash_entries=256):
+        self.cache_dir = cache_dir
+        self.max_frames = max_frames
+        self.max_width = max_width
+        self.max_height = max_height
+        self.quality = quality
+        self.max_text_chars = max_text_chars
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.hash_entries = hash_entries
+        self.hashes = OrderedDict()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _options_key(self):
+        return f"{self.max_frames}:{self.max_width}x{self.max_height}:{self.quality}:{self.max_text_chars}"
+
+    def content_hash(self, path):
+        # Memoized on (path, size, mtime) so asking about the same file again skips the read
+        stat = os.stat(path)
+        memo = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if memo in self.hashes:
+            self.hashes.move_to_end(memo)
+            return self.hashes[memo]
+        digest = hashlib.sha256(self._options_key().encode())
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK):
+                digest.update(chunk)
+        self.hashes[memo] = digest.hexdigest()
+        while len(self.hashes) > self.hash_entries:
+            self.hashes.popitem(last=False)
+        return self.hashes[memo]
+
+    def process(self, path):
+        try:
+            key = self.content_hash(path)
+        except OSError as e:
+            # Folders, files deleted or locked since the drop: reported like a failed decode, never cached
+            return [TextAttachment(os.path.basename(os.path.normpath(path)), f"[Could not read this file: {e}]")]
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+
+        parts = self._load(key)
+        if parts is None:
+            parts, ok = self._convert(path)
+            # A failed decode may be transient (file still being written...), it is retried next time
+            if not ok: return parts
+            self._store(key, parts)
+
+        self.memory[key] = parts
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+        return parts
+
+    def _convert(self, path):
+        # -> (parts, converted); a read error still yields a part so the VLM knows about the file
+        name = os.path.basename(path)
+        ext = os.path.splitext(path)[1][1:].lower()
+        try:
+            if ext in IMAGE_EXT: return self._image(path), True
+            if ext in VIDEO_EXT: return self._video(path, name), True
+            if ext in TEXT_EXT: return [TextAttachment(name, self._text(path))], True
+            if ext == "docx": return [TextAttachment(name, self._docx(path))], True
+            if ext == "pdf": return [TextAttachment(name, self._pdf(path))], True
+        except Exception as e:
+            return [TextAttachment(name, f"[Could not read this file: {e}]")], False
+        return [TextAttachment(name, f"[Unsupported file type .{ext}, only its name is available]")], True
+
+    def _encode(self, image):
+        return encode_frame(image, self.max_width, self.max_height, self.quality, "jpeg")
+
+    def _image(self, path):
+        # Large files are decoded at reduced resolution straight away
+        flag = cv2.IMREAD_REDUCED_COLOR_4 if os.path.getsize(path) > 20 * CHUNK else cv2.IMREAD_COLOR
+        image = cv2.imread(path, flag)
+        if image is None:
+            raise ValueError("unreadable image")
+        return [self._encode(image)]
+
+    def _video(self, path, name):
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise ValueError("unreadable video")
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        count = max(1, min(self.max_frames, total))
+        indices = [int((i + 0.5) * total / count) for i in range(count)] if total > 0 else [0]
+
+        parts, stamps = [], []
+        for index in indices:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, image = cap.read()
+            if not ok: continue
+            parts.append(self._encode(image))
+            stamps.append(f"{index / fps:.1f}s")
+        cap.release()
+        if not parts:
+            raise ValueError("no decodable frames")
+
+        duration = total / fps if total > 0 else 0
+        note = (f"Video of {duration:.1f}s, the {len(parts)} images after this note are "
+                f"keyframes sampled at {', '.join(stamps)}.")
+        return [TextAttachment(name, note)] + parts
+
+    def _text(self, path):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read(self.max_text_chars + 1)
+        return self._clip(text)
+
+    def _docx(self, path):
+        with zipfile.ZipFile(path) as z, z.open("word/document.xml") as f:
+            xml = f.read(self.max_text_chars * 20).decode("utf-8", errors="replace")
+        xml = re.sub(r"</w:p>", "\n", xml)
+        return self._clip(html.unescape(re.sub(r"<[^>]+>", "", xml)))
+
+    def _pdf(self, path):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return "[PDF text extraction needs the optional pypdf package]"
+        text = ""
+        for page in PdfReader(path).pages:
+            text += (page.extract_text() or "") + "\n"
+            if len(text) > self.max_text_chars: break
+        return self._clip(text)
+
+    def _clip(self, text):
+        text = text.strip()
+        if len(text) > self.max_text_chars:
+            text = text[:self.max_text_chars] + "\n[...truncated]"
+        return text
+
+    # =========================
+    # DISK CACHE
+    # =========================
+    def _load(self, key):
+        folder = os.path.join(self.cache_dir, key)
+        manifest = os.path.join(folder, "manifest.json")
+        if not os.path.exists(manifest):
+            return None
+        with open(manifest, "r") as f:
+            entries = json.load(f)
+        parts = []
+        for entry in entries:
+            if entry["type"] == "text":
+                parts.append(TextAttachment(entry["name"], entry["text"]))
+            else:
+                with open(os.path.join(folder, entry["file"]), "rb") as f:
+                    parts.append(EncodedMedia(f.read(), entry["mime"], entry["kind"], entry.get("stats")))
+        return parts
+
+    def _store(self, key, parts):
+        folder = os.path.join(self.cache_dir, key)
+        os.makedirs(folder, exist_ok=True)
+        entries = []
+        for i, part in enumerate(parts):
+            if isinstance(part, TextAttachment):
+                entries.append({"type": "text", "name": part.name, "text": part.text})
+            else:
+                filename = f"part_{i:03d}.bin"
+                with open(os.path.join(folder, filename), "wb") as f:
+                    f.write(part.data)
+                entries.append({"type": "media", "file": filename, "mime": part.mime,
+                                "kind": part.kind, "stats": part.stats})
+        with open(os.path.join(folder, "manifest.json"), "w") as f:
+            json.dump(entries, f)
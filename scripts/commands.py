@@ -1,152 +1,207 @@
 import time
-import struct
 import threading
-import cv2
-import zmq
-import numpy as np
 
-# =========================
-# ZMQ CONNECTION & LOCKING
-# =========================
-ctx = zmq.Context()
-socket = ctx.socket(zmq.REQ)
-zmq_lock = threading.Lock()
-
-def connect_zmq(address="tcp://localhost:5555"):
-    print("Waiting for Isaac...")
-    socket.connect(address)
-    while True:
-        try:
-            socket.send(struct.pack("dd", 0.0, 0.0))
-            socket.recv()
-            break
-        except Exception:
-            time.sleep(0.5)
-    print("Connected ✔")
-
-def safe_zmq_send(left, right):
-    with zmq_lock:
-        try:
-            socket.send(struct.pack("dd", float(left), float(right)))
-            return socket.recv()
-        except Exception as e:
-            print(f"[ZMQ ERROR] {e}")
-            return None
+from scripts import metrics
+from scripts.control import FollowController
+from scripts.framering import FrameWaiter, META_FILE, NOTIFY_ADDRESS
+from scripts.motor import MotorChannel
+from scripts.motion import MotionScheduler
+from scripts.tracking import HybridTracker
 
 # =========================
-# ROBOT STATE
+# SHARED STATE
 # =========================
-vision_enabled = False
-vision_window_open = False  
-last_left = 0.0
-last_right = 0.0
-
-motion_lock = threading.Lock()
-motion_id = 0
-
-target_lock = threading.Lock()
-target_id = 0
-target_thread = None
-current_annotated_frame = None
+# Overridden from the `tracking` section of config.yaml
+tracking_config = {
+    "detect_every": 5,      # full YOLOE pass every N frames
+    "confidence": 0.2,      # detector confidence threshold
+    "min_match": 0.5,       # template score below which we re-detect early
+    "roi_scale": 2.0,       # search window around the predicted box
+    "roi_detect": True,     # try re-detection inside the expanded ROI first
+    "imgsz": 640,
+    "memory_timeout": 2.0,
+}
+
+# Overridden from the `follow` section: the controller that steers toward the tracked box
+follow_config = {
+    "rate": 30.0,           # control ticks per second, independent of the detection rate
+    "kp": 3.0,
+    "ki": 0.5,
+    "kd": 0.0,
+    "deadzone": 0.1,        # fraction of the half-width where the robot drives straight
+    "forward_speed": 5.0,
+    "max_turn": 3.0,
+    "slow_size": 0.3,       # box height / frame height where the robot starts slowing down
+    "stop_size": 0.7,       # ... and where it stops
+    "slew_rate": 20.0,      # max wheel speed change per second
+    "extrapolate": 0.25,    # seconds the last observation is carried forward
+}
 
 # =========================
-# CORE FUNCTIONS
+# ROBOT
 # =========================
+class Robot:
+    # One Carter: its frame stream, motor channel, motion scheduler and tracker.
+    # The detector backend and the HTTP client are shared, see scripts/robots.py.
+    def __init__(self, name="carter", motor_address="tcp://localhost:5555", meta_file=META_FILE,
+                 notify_address=NOTIFY_ADDRESS, stream_address=None):
+        self.name = name
+        self.motor_address = motor_address
+        self.meta_file = meta_file
+        self.notify_address = notify_address
+        self.stream_address = stream_address  # where nemo.py sends frames over the network
+        self.frames = None  # FrameReader, attached by the startup loader
+        self.vision_enabled = False
+
+        self.motor = MotorChannel(on_connect=lambda: print(f"Connected ✔ ({name})"))
+        # One thread runs every motion command, in order, off a timer queue
+        self.scheduler = MotionScheduler(self.safe_zmq_send)
+
+        self.target_lock = threading.Lock()
+        self.target_id = 0
+        self.current_overlay = None  # what the vision panel draws over the raw frame
+
+        # Dialogue state, filled in by main.py
+        self.memory = None
+        self.intents = None
+        self.notify = None  # notify(text) shows a message in the chat, from any thread
+
+    # =========================
+    # MOTOR CHANNEL
+    # =========================
+    def connect_zmq(self, address=None):
+        # Returns right away, the channel keeps reconnecting in the background
+        print(f"Waiting for Isaac... ({self.name})")
+        self.motor.connect(address or self.motor_address)
+        self.motor.send(0.0, 0.0)  # same handshake as before, also tells us when Isaac answers
+
+    def safe_zmq_send(self, left, right):
+        self.motor.send(left, right)
+
+    # =========================
+    # CORE FUNCTIONS
+    # =========================
+    def execute_motion(self, left, right, duration=None):
+        # Single command, replaces whatever motion plan is running
+        return self.scheduler.submit([(left, right, duration)])
+
+    def execute_plan(self, steps, deadline=None):
+        # Ordered [(left, right, duration or None), ...] run back to back by the scheduler thread
+        return self.scheduler.submit(steps, deadline)
+
+    def scale_speed(self, factor):
+        return self.scheduler.scale(factor)
+
+    def execute_target(self, prompt_class, frame_source, detector, memory_timeout=None, pool=None, batcher=None):
+        # detector: a backend from scripts/detectors.py, unused when a pool or batcher is given
+        self.vision_enabled = True
+        cfg = dict(tracking_config)
+        if memory_timeout is None: memory_timeout = cfg["memory_timeout"]
+
+        with self.target_lock:
+            self.target_id += 1
+            current_id = self.target_id
 
-def execute_motion(left, right, duration=None):
-    global motion_id, last_left, last_right
-    last_left, last_right = left, right
-    
-    with motion_lock:
-        motion_id += 1
-        current_id = motion_id
-
-    def worker():
-        print(f"[MOTION] {left}, {right}")
-        safe_zmq_send(left, right)
-        if duration is not None:
-            start = time.time()
-            while time.time() - start < duration:
-                if current_id != motion_id: return
-                time.sleep(0.05)
-            if current_id == motion_id:
-                print("[MOTION] STOP")
-                safe_zmq_send(0, 0)
-
-    threading.Thread(target=worker, daemon=True).start()
-
-def execute_target(prompt_class, frame_source, model_instance, memory_timeout=2.0):
-    global target_id, target_thread, current_annotated_frame, vision_enabled
-    vision_enabled = True
-    
-    with target_lock:
-        target_id += 1
-        current_id = target_id
-
-    def worker():
-        global current_annotated_frame
-        last_seen = None
-        last_seen_time = None
-        
         clean_class = prompt_class.strip().replace('"', '').replace("'", "")
-        model_instance.set_classes([clean_class])
-
-        while current_id == target_id:
-            if frame_source is None: continue
-            
-            local_frame = frame_source.copy()
-            results = model_instance.predict(local_frame, conf=0.2, verbose=False)
-            img_width = local_frame.shape[1]
-            target_center = None
-            largest_area = 0
-
-            for box in results[0].boxes:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                area = (x2 - x1) * (y2 - y1)
-                if area > largest_area:
-                    largest_area = area
-                    target_center = ((x1 + x2) / 2, (y1 + y2) / 2)
-
-            if target_center:
-                last_seen, last_seen_time = target_center, time.time()
-            elif last_seen and (time.time() - last_seen_time) > memory_timeout:
-                last_seen = None
-
-            # Control Logic
-            if last_seen:
-                offset = ((last_seen[0] / img_width) - 0.5) * 200
-                deadzone = 10
-                if abs(offset) <= deadzone:
-                    safe_zmq_send(5, 5)
-                else:
-                    mapped = max(0, min(3, (abs(offset) - deadzone) / 90 * 3))
-                    if offset > 0: safe_zmq_send(5 - mapped, 5 + mapped)
-                    else: safe_zmq_send(5 + mapped, 5 - mapped)
-            else:
-                safe_zmq_send(0, 0)
-
-            temp_annotated = results[0].plot()
-            if last_seen:
-                cv2.circle(temp_annotated, (int(last_seen[0]), int(last_seen[1])), 8, (0, 255, 255), -1)
-            current_annotated_frame = temp_annotated
-
-        current_annotated_frame = None
-
-    threading.Thread(target=worker, daemon=True).start()
-
-def update_vision_system(raw_frame, window_name):
-    global vision_enabled, vision_window_open, current_annotated_frame, target_id
-    
-    if vision_enabled and raw_frame is not None:
-        display_frame = current_annotated_frame if current_annotated_frame is not None else raw_frame
-        cv2.imshow(window_name, display_frame)
-        vision_window_open = True
-        
-        if cv2.waitKey(1) & 0xFF == ord('x'):
-            vision_enabled = False
-            with target_lock: target_id += 1
-            current_annotated_frame = None
-    elif vision_window_open:
-        try: cv2.destroyWindow(window_name)
-        except: pass
-        vision_window_open = False
\ No newline at end of file
+
+        def worker():
+            last_seen = None
+            last_seen_time = None
+            local_frame = None
+            last_id = 0
+
+            def detect(image, imgsz, region):
+                # Worker processes read frame `last_id` from this robot's ring themselves
+                if pool is not None:
+                    with metrics.span("detect", imgsz=imgsz, pool=True):
+                        boxes, _ = pool.detect(last_id, [clean_class], imgsz, cfg["confidence"], region,
+                                               meta_file=self.meta_file)
+                    return boxes
+
+                # Other robots' requests share the same forward pass
+                if batcher is not None:
+                    with metrics.span("detect", imgsz=imgsz, batched=True):
+                        return batcher.detect(image, [clean_class], imgsz, cfg["confidence"], region)
+
+                x0, y0 = 0, 0
+                if region is not None:
+                    x0, y0, x1, y1 = region
+                    image = image[y0:y1, x0:x1]
+                # The backend is shared between trackers and swaps its vocabulary itself
+                with metrics.span("detect", imgsz=imgsz):
+                    boxes = detector.detect([image], [clean_class], cfg["confidence"], imgsz)[0]
+                return [(x1 + x0, y1 + y0, x2 + x0, y2 + y0, score) for x1, y1, x2, y2, score, _ in boxes]
+
+            if frame_source is None: return
+            waiter = FrameWaiter(frame_source)
+            tracker = HybridTracker(detect, cfg["detect_every"], cfg["min_match"],
+                                    cfg["roi_scale"], cfg["roi_detect"], cfg["imgsz"])
+
+            # Steers at its own fixed rate from the latest observation, between frames too.
+            # Nothing goes out once this target is replaced or stopped, even before the loop notices.
+            def send(left, right):
+                if current_id == self.target_id: self.safe_zmq_send(left, right)
+            controller = FollowController(send, memory_timeout=memory_timeout, **follow_config).start()
+            if batcher is not None: batcher.attach()
+
+            try:
+                while current_id == self.target_id:
+                    # Sleep until the simulator publishes a new frame, never run twice on the same one
+                    current = waiter.wait(last_id, timeout=0.5)
+                    if current is None: continue
+                    current, local_frame = frame_source.read(local_frame)
+                    last_id = current.frame_id
+                    metrics.observe("frame_age", current.age)
+
+                    # YOLOE every N frames, Kalman + template matching in between
+                    with metrics.span("track"):
+                        box, source = tracker.update(local_frame)
+                    img_height, img_width = local_frame.shape[:2]
+                    target_center = None
+                    if box is not None:
+                        target_center = ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+                        # Stamped with the capture time, so detection latency is extrapolated away
+                        controller.observe((target_center[0] / img_width - 0.5) * 2,
+                                           (box[3] - box[1]) / img_height, current.timestamp)
+
+                    if target_center:
+                        last_seen, last_seen_time = target_center, time.time()
+                    elif last_seen and (time.time() - last_seen_time) > memory_timeout:
+                        last_seen = None
+
+                    # Overlay is a few numbers, the panel draws it; nothing at all while hidden
+                    if self.vision_enabled:
+                        self.current_overlay = {
+                            "frame_id": last_id, "label": clean_class, "source": source, "score": tracker.score,
+                            "box": box, "point": last_seen,
+                        }
+                    else:
+                        self.current_overlay = None
+            except Exception as e:
+                # Detector / batcher / pool failures end this target like a stop, and say so
+                print(f"[TRACKING] {self.name} stopped following {clean_class}: {type(e).__name__}: {e}")
+                controller.stop()
+                if current_id == self.target_id:
+                    self.stop_tracking()
+                    self.safe_zmq_send(0.0, 0.0)
+                    if self.memory is not None:
+                        self.memory.set_state("motion", "stopped")
+                        self.memory.set_state("target", None)
+                    if self.notify is not None:
+                        self.notify(f"⚠ Stopped following the {clean_class}: {e}")
+            finally:
+                if batcher is not None: batcher.detach()
+                controller.stop()
+                waiter.close()
+                self.current_overlay = None
+
+        threading.Thread(target=worker, name=f"track-{self.name}", daemon=True).start()
+
+    def stop_tracking(self):
+        with self.target_lock: self.target_id += 1
+        self.current_overlay = None
+
+    def close(self):
+        self.stop_tracking()
+        self.motor.close()
+        if self.frames is not None: self.frames.close()
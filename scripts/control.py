@@ -0,0 +1,130 @@
+import threading
+import time
+
+from scripts import metrics
+
+# =========================
+# PID
+# =========================
+class PID:
+    def __init__(self, kp, ki=0.0, kd=0.0, integral_limit=1.0):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.integral_limit = integral_limit
+        self.integral = 0.0
+        self.previous = None
+
+    def reset(self):
+        self.integral = 0.0
+        self.previous = None
+
+    def update(self, error, dt):
+        self.integral = max(-self.integral_limit, min(self.integral_limit, self.integral + error * dt))
+        derivative = 0.0 if self.previous is None or dt <= 0 else (error - self.previous) / dt
+        self.previous = error
+        return self.kp * error + self.ki * self.integral + self.kd * derivative
+
+def slew(current, target, max_step):
+    return current + max(-max_step, min(max_step, target - current))
+
+# =========================
+# FOLLOW CONTROLLER
+# =========================
+class FollowController:
+    # Steers toward the target at a fixed `rate`, whatever the detection rate.
+    # Observations are (horizontal offset in [-1, 1], box height / frame height,
+    # capture time); between them the offset is extrapolated from the last two,
+    # for at most `extrapolate` seconds. Wheel speeds are slew limited.
+    def __init__(self, send, rate=30.0, kp=3.0, ki=0.5, kd=0.0, deadzone=0.1, forward_speed=5.0,
+                 max_turn=3.0, slow_size=0.3, stop_size=0.7, slew_rate=20.0, extrapolate=0.25,
+                 memory_timeout=2.0):
+        self.send = send
+        self.period = 1.0 / rate
+        self.pid = PID(kp, ki, kd, integral_limit=1.0 / ki if ki else 1.0)
+        self.deadzone = deadzone
+        self.forward_speed = forward_speed
+        self.max_turn = max_turn
+        self.slow_size = slow_size
+        self.stop_size = stop_size
+        self.slew_rate = slew_rate
+        self.extrapolate = extrapolate
+        self.memory_timeout = memory_timeout
+
+        self.lock = threading.Lock()
+        self.last = None       # (offset, size, time)
+        self.velocity = 0.0    # offset per second
+        self.left = 0.0
+        self.right = 0.0
+        self.ticks = 0
+        self.observed = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def observe(self, offset, size, timestamp):
+        with self.lock:
+            first = self.last is None
+            if not first and timestamp > self.last[2]:
+                velocity = (offset - self.last[0]) / (timestamp - self.last[2])
+                self.velocity = self.velocity * 0.5 + velocity * 0.5
+            self.last = (offset, size, timestamp)
+        if first: self.observed.set()  # acted on at once, not at the next tick
+
+    def estimate(self, now):
+        # -> (offset, size) predicted for `now`, or None once the target is forgotten
+        with self.lock:
+            if self.last is None or now - self.last[2] > self.memory_timeout:
+                return None
+            offset, size, stamp = self.last
+            ahead = min(max(0.0, now - stamp), self.extrapolate)
+            return max(-1.0, min(1.0, offset + self.velocity * ahead)), size
+
+    def step(self, now, dt):
+        # One control decision -> (left, right) after slew limiting
+        estimate = self.estimate(now)
+        if estimate is None:
+            self.pid.reset()
+            target_left = target_right = 0.0
+        else:
+            offset, size = estimate
+            error = 0.0 if abs(offset) <= self.deadzone else offset - self.deadzone * (1 if offset > 0 else -1)
+            turn = max(-self.max_turn, min(self.max_turn, self.pid.update(error, dt)))
+            # Apparent size as distance: full speed while small, stop when it fills the view
+            closeness = (size - self.slow_size) / max(1e-6, self.stop_size - self.slow_size)
+            forward = self.forward_speed * max(0.0, min(1.0, 1.0 - closeness))
+            target_left, target_right = forward - turn, forward + turn
+
+        max_step = self.slew_rate * dt
+        self.left = slew(self.left, target_left, max_step)
+        self.right = slew(self.right, target_right, max_step)
+        return self.left, self.right
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="follow-control", daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        # Ticks from the start: until the target is seen (and once it is forgotten)
+        # the robot slews to a stop instead of keeping whatever motion it had
+        next_tick = time.monotonic()
+        previous = time.time()
+        while self._running:
+            now = time.time()
+            with metrics.span("control"):
+                left, right = self.step(now, now - previous)
+                self.send(left, right)
+            self.ticks += 1
+            previous = now
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0 and self.observed.wait(delay):
+                self.observed.clear()
+                next_tick = time.monotonic()
+            elif delay <= 0: next_tick = time.monotonic()
+
+    def stop(self):
+        self._running = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
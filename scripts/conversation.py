@@ -0,0 +1,114 @@
+import re
+import threading
+
+# =========================
+# TOKEN ESTIMATE
+# =========================
+# The NIM tokenizer is not available locally, so budgets use a conservative
+# estimate: roughly 4 characters per token, never fewer than one per word/symbol.
+def count_tokens(text):
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = " ".join(part.get("text", "") for part in text if isinstance(part, dict))
+    return max(len(text) // 4, len(re.findall(r"\w+|[^\w\s]", text)))
+
+def count_message(message):
+    return count_tokens(message["content"]) + 4
+
+# =========================
+# CONVERSATION STORE
+# =========================
+class Conversation:
+    # messages() layout, oldest first:
+    #   system: persona            (identical every turn so the server can cache the prefix)
+    #   system: summary of older turns
+    #   user / assistant turns     (trimmed from the oldest end to fit the budget)
+    #   system: pinned robot state
+    def __init__(self, persona, budget_tokens=6000, keep_recent_turns=6, compact_at=0.75, summarizer=None):
+        self.persona = persona
+        self.budget_tokens = budget_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.compact_at = compact_at
+        self.summarizer = summarizer
+
+        self.lock = threading.Lock()
+        self.turns = []
+        self.summary = ""
+        self.state = {}
+        self._compacting = False
+
+    def set_state(self, key, value):
+        with self.lock:
+            if value is None: self.state.pop(key, None)
+            else: self.state[key] = value
+
+    def add_turn(self, prompt, response):
+        with self.lock:
+            self.turns.append({"role": "user", "content": prompt})
+            self.turns.append({"role": "assistant", "content": response})
+        self._maybe_compact()
+
+    def clear(self):
+        # "Erase history": turns and summary go, the pinned robot state stays (it is still true)
+        with self.lock:
+            self.turns = []
+            self.summary = ""
+
+    def tokens(self):
+        with self.lock:
+            return sum(count_message(m) for m in self._layout(self.turns))
+
+    def _layout(self, turns):
+        messages = [{"role": "system", "content": self.persona}]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        messages.extend(turns)
+        if self.state:
+            state = ", ".join(f"{k}: {v}" for k, v in self.state.items())
+            messages.append({"role": "system", "content": f"Current robot state: {state}"})
+        return messages
+
+    def messages(self, reserve_tokens=0):
+        # History for the next request, leaving `reserve_tokens` for the new user turn
+        with self.lock:
+            turns = list(self.turns)
+            while turns:
+                total = sum(count_message(m) for m in self._layout(turns)) + reserve_tokens
+                if total <= self.budget_tokens: break
+                # Drop whole exchanges so the history never starts with an assistant turn
+                turns = turns[2:] if len(turns) > 1 else []
+            return self._layout(turns)
+
+    # =========================
+    # ROLLING SUMMARY
+    # =========================
+    def _maybe_compact(self):
+        if self.summarizer is None:
+            return
+        with self.lock:
+            used = sum(count_message(m) for m in self._layout(self.turns))
+            keep = self.keep_recent_turns * 2
+            if self._compacting or used < self.budget_tokens * self.compact_at or len(self.turns) <= keep:
+                return
+            self._compacting = True
+            old = self.turns[:-keep]
+            summary = self.summary
+        threading.Thread(target=self._compact, args=(old, summary), daemon=True).start()
+
+    def _compact(self, old, summary):
+        try:
+            transcript = "\n".join(f"{m['role']}: {m['content']}" for m in old)
+            if summary:
+                transcript = f"Previous summary: {summary}\n{transcript}"
+            new_summary = self.summarizer(transcript).strip()
+            with self.lock:
+                # Turns may have been added meanwhile, only the summarized prefix is replaced
+                if self.turns[:len(old)] == old:
+                    self.turns = self.turns[len(old):]
+                    self.summary = new_summary
+        except Exception as e:
+            print(f"[MEMORY] Summarization failed: {e}")
+        finally:
+            with self.lock:
+                self._compacting = False
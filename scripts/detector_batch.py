@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+
+from scripts import metrics
+
+# =========================
+# BATCHED DETECTION
+# =========================
+# The trackers of several robots call detect() from their own threads. Requests
+# that arrive within `window` seconds of each other (or as soon as every running
+# tracker has one in) go through a single detect() on a list of images, with the
+# union of their classes as vocabulary; each caller only gets back boxes of its
+# own classes. One robot alone never waits: the batch is full at one request.
+class _Request:
+    __slots__ = ("image", "names", "imgsz", "conf", "offset", "boxes", "error", "done")
+
+    def __init__(self, image, names, imgsz, conf, offset):
+        self.image = image
+        self.names = names
+        self.imgsz = imgsz
+        self.conf = conf
+        self.offset = offset
+        self.boxes = []
+        self.error = None
+        self.done = threading.Event()
+
+class BatchDetector:
+    # detector: a backend from scripts/detectors.py
+    def __init__(self, detector, window=0.005, max_batch=16):
+        self.detector = detector
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = queue.SimpleQueue()
+        self.clients = 0
+        self.clients_lock = threading.Lock()
+        self.batches = 0
+        self.batched = 0
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="detect-batch", daemon=True)
+        self._thread.start()
+        return self
+
+    # Trackers register while they run, so a batch knows how many requests to expect
+    def attach(self):
+        with self.clients_lock: self.clients += 1
+
+    def detach(self):
+        with self.clients_lock: self.clients -= 1
+
+    def detect(self, image, names, imgsz=640, conf=0.2, region=None):
+        # -> [(x1, y1, x2, y2, score), ...] in full-frame pixels, same as an in-process predict
+        x0, y0 = 0, 0
+        if region is not None:
+            x0, y0, x1, y1 = region
+            image = image[y0:y1, x0:x1]
+        request = _Request(image, list(names), imgsz, conf, (x0, y0))
+        self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.boxes
+
+    def stats(self):
+        return {"batches": self.batches, "requests": self.batched,
+                "mean_batch": self.batched / self.batches if self.batches else 0.0}
+
+    # =========================
+    # BATCH THREAD
+    # =========================
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < min(self.max_batch, max(1, self.clients)):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            try: batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty: break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            # Letterboxing is per imgsz, so full-frame and ROI passes run separately
+            groups = {}
+            for request in batch: groups.setdefault(request.imgsz, []).append(request)
+            for imgsz, group in groups.items():
+                try:
+                    self._run(imgsz, group)
+                except Exception as e:
+                    for request in group: request.error = e
+                for request in group: request.done.set()
+
+    def _run(self, imgsz, group):
+        names = list(dict.fromkeys(name for request in group for name in request.names))
+        with metrics.span("detect_batch", imgsz=imgsz, size=len(group)):
+            results = self.detector.detect([request.image for request in group], names,
+                                           min(request.conf for request in group), imgsz)
+        self.batches += 1
+        self.batched += len(group)
+        metrics.count("detect_batches")
+
+        for request, boxes in zip(group, results):
+            wanted = {names.index(name) for name in request.names}
+            x0, y0 = request.offset
+            for x1, y1, x2, y2, score, cls in boxes:
+                if cls not in wanted or score < request.conf: continue
+                request.boxes.append((x1 + x0, y1 + y0, x2 + x0, y2 + y0, score))
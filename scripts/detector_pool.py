@@ -0,0 +1,289 @@
+from multiprocessing import shared_memory
+import argparse
+import importlib
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+import zmq
+
+from scripts.detectors import create_detector
+from scripts.framering import FrameReader, FrameRingError, attach_segment, META_FILE
+
+# =========================
+# OUT-OF-PROCESS DETECTION
+# =========================
+# Each worker is a separate `python -m scripts.detector_pool` process with its
+# own interpreter (no GIL shared with Qt / ZMQ / Whisper). It attaches to the
+# simulator's frame rings itself (one per robot camera), so a request is only a
+# meta file, a frame id, a class list and an optional region; no pixels cross
+# the process boundary. Boxes come back
+# in a small per-worker shared array: [x1, y1, x2, y2, score, class] rows.
+BOX_FIELDS = 6
+
+class _Worker:
+    def __init__(self, index, max_boxes):
+        self.index = index
+        self.lock = threading.Lock()
+        self.shm = shared_memory.SharedMemory(create=True, size=max_boxes * BOX_FIELDS * 4)
+        self.boxes = np.ndarray((max_boxes, BOX_FIELDS), dtype=np.float32, buffer=self.shm.buf)
+        self.process = None
+        self.sock = None
+        self.ready = False
+        self.seq = 0
+        self.requests = 0
+        self.failures = 0
+        self.restarts = 0
+        self.failed_starts = 0
+        self.retry_at = 0.0
+        self.avg_time = None
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+class DetectorPool:
+    # detector: create_detector() keyword arguments (the `detector` section), built in every worker
+    # factory: "module:callable" to build it with instead, given `detector` as is (benchmark stand-ins)
+    def __init__(self, workers=1, meta_file=META_FILE, detector=None, cache_dir="models/embeddings",
+                 threads=None, factory=None, max_boxes=32, start_timeout=180.0, request_timeout=5.0, supervise_every=1.0):
+        self.meta_file = meta_file
+        self.threads = threads or max(1, (os.cpu_count() or 2) // max(1, workers))
+        # Per-worker threads win over the detector's own, workers share the cores
+        self.detector = {"cache_dir": cache_dir, **(detector or {}), "threads": self.threads}
+        self.factory = factory
+        if factory:
+            self.detector = dict(detector or {})
+        self.max_boxes = max_boxes
+        self.start_timeout = start_timeout
+        self.request_timeout = request_timeout
+        self.supervise_every = supervise_every
+        self.ctx = zmq.Context.instance()
+        self.workers = [_Worker(i, max_boxes) for i in range(workers)]
+        self.idle = queue.Queue()
+        self._running = False
+
+    # =========================
+    # LIFECYCLE
+    # =========================
+    def start(self):
+        self._running = True
+        for worker in self.workers:
+            self._spawn(worker)
+            self.idle.put(worker)
+        threading.Thread(target=self._supervise, daemon=True).start()
+        return self
+
+    def _spawn(self, worker):
+        worker.sock = self.ctx.socket(zmq.PAIR)
+        worker.sock.setsockopt(zmq.LINGER, 0)
+        port = worker.sock.bind_to_random_port("tcp://127.0.0.1")
+        worker.ready = False
+        worker.process = subprocess.Popen(
+            [sys.executable, "-m", "scripts.detector_pool", "--address", f"tcp://127.0.0.1:{port}",
+             "--results", worker.shm.name, "--max-boxes", str(self.max_boxes), "--meta-file", self.meta_file,
+             "--detector", json.dumps(self.detector), "--factory", self.factory or "",
+             "--threads", str(self.threads),
+             "--parent", str(os.getpid())],
+            cwd=os.getcwd(),
+        )
+
+    def _restart(self, worker, reason):
+        print(f"[DETECTOR] Worker {worker.index} {reason}, restarting")
+        if worker.alive():
+            worker.process.kill()
+            worker.process.wait()
+        worker.sock.close()
+        worker.restarts += 1
+        self._spawn(worker)
+
+    def _wait_ready(self, worker, timeout):
+        if worker.ready:
+            return True
+        if worker.sock.poll(int(timeout * 1000)):
+            message = worker.sock.recv_json()
+            worker.ready = message.get("ready", False)
+            if worker.ready:
+                worker.failed_starts = 0
+            else:
+                # A model that cannot load is retried with backoff, not in a tight loop
+                worker.failed_starts += 1
+                worker.retry_at = time.monotonic() + min(60.0, 2.0 ** worker.failed_starts)
+                print(f"[DETECTOR] Worker {worker.index} failed to start: {message.get('error')}")
+        return worker.ready
+
+    def _ensure_running(self, worker):
+        if worker.alive():
+            return True
+        self._wait_ready(worker, 0)  # picks up a startup error the dead worker left behind
+        if time.monotonic() < worker.retry_at:
+            return False
+        self._restart(worker, f"exited with code {worker.process.poll()}")
+        return True
+
+    def wait_ready(self, timeout=None):
+        # True once every worker has loaded its model (used by the startup loader)
+        timeout = self.start_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            with worker.lock:
+                if not self._wait_ready(worker, max(0.0, deadline - time.monotonic())):
+                    return False
+        return True
+
+    def _supervise(self):
+        # Idle workers that died are brought back without waiting for the next request
+        while self._running:
+            time.sleep(self.supervise_every)
+            for worker in self.workers:
+                if worker.lock.acquire(blocking=False):
+                    try:
+                        if self._running: self._ensure_running(worker)
+                    finally:
+                        worker.lock.release()
+
+    def close(self):
+        self._running = False
+        for worker in self.workers:
+            with worker.lock:
+                if worker.alive():
+                    try: worker.sock.send_json({"stop": True}, zmq.NOBLOCK)
+                    except zmq.ZMQError: pass
+                    try: worker.process.wait(timeout=2.0)
+                    except subprocess.TimeoutExpired: worker.process.kill()
+                worker.sock.close()
+                worker.shm.close()
+                worker.shm.unlink()
+
+    # =========================
+    # REQUESTS
+    # =========================
+    def detect(self, frame_id, names, imgsz=640, conf=0.2, region=None, meta_file=None):
+        # -> ([(x1, y1, x2, y2, score), ...] in full-frame pixels, frame id actually used)
+        # Any failure returns no boxes: the tracker treats it like an empty frame.
+        # meta_file picks the robot camera, the pool's own ring by default.
+        try:
+            worker = self.idle.get(timeout=self.request_timeout)
+        except queue.Empty:
+            return [], frame_id
+        try:
+            with worker.lock:
+                return self._request(worker, frame_id, names, imgsz, conf, region, meta_file or self.meta_file)
+        finally:
+            self.idle.put(worker)
+
+    def _request(self, worker, frame_id, names, imgsz, conf, region, meta_file):
+        if not self._ensure_running(worker) or not self._wait_ready(worker, self.start_timeout):
+            worker.failures += 1
+            return [], frame_id
+
+        worker.seq += 1
+        worker.requests += 1
+        start = time.perf_counter()
+        worker.sock.send_json({"seq": worker.seq, "meta_file": meta_file, "frame_id": frame_id, "names": list(names),
+                               "imgsz": imgsz, "conf": conf, "region": region})
+        while worker.sock.poll(int(self.request_timeout * 1000)):
+            reply = worker.sock.recv_json()
+            if reply.get("seq") != worker.seq:
+                continue  # late answer to a request that already timed out
+            if "error" in reply:
+                worker.failures += 1
+                print(f"[DETECTOR] Worker {worker.index}: {reply['error']}")
+                return [], frame_id
+            elapsed = time.perf_counter() - start
+            worker.avg_time = elapsed if worker.avg_time is None else worker.avg_time * 0.9 + elapsed * 0.1
+            rows = worker.boxes[:reply["count"]]
+            return [(float(r[0]), float(r[1]), float(r[2]), float(r[3]), float(r[4])) for r in rows], reply["frame_id"]
+
+        worker.failures += 1
+        self._restart(worker, f"did not answer within {self.request_timeout}s")
+        return [], frame_id
+
+    def stats(self):
+        return [{
+            "worker": w.index, "alive": w.alive(), "ready": w.ready, "requests": w.requests,
+            "failures": w.failures, "restarts": w.restarts,
+            "avg_ms": None if w.avg_time is None else w.avg_time * 1000,
+        } for w in self.workers]
+
+# =========================
+# WORKER PROCESS
+# =========================
+def _worker_main(args):
+    import cv2
+    cv2.setNumThreads(args.threads)
+    sock = zmq.Context.instance().socket(zmq.PAIR)
+    sock.setsockopt(zmq.LINGER, 0)
+    sock.connect(args.address)
+
+    try:
+        build = create_detector
+        if args.factory:
+            module, _, name = args.factory.partition(":")
+            build = getattr(importlib.import_module(module), name)
+        detector = build(**json.loads(args.detector))
+        results_shm = attach_segment(args.results)
+        out = np.ndarray((args.max_boxes, BOX_FIELDS), dtype=np.float32, buffer=results_shm.buf)
+    except Exception as e:
+        sock.send_json({"ready": False, "error": f"{type(e).__name__}: {e}"})
+        return
+    sock.send_json({"ready": True, "pid": os.getpid()})
+
+    readers = {}  # meta file -> (reader, meta file mtime, local copy)
+    while True:
+        # Leave with the parent instead of lingering as an orphan
+        if not sock.poll(1000):
+            if os.getppid() != args.parent: break
+            continue
+        request = sock.recv_json()
+        if request.get("stop"):
+            break
+        meta_file = request.get("meta_file") or args.meta_file
+        try:
+            # Attach lazily, and again if nemo.py was restarted with a new segment
+            stamp = os.stat(meta_file).st_mtime_ns
+            if meta_file in readers and readers[meta_file][1] != stamp:
+                readers.pop(meta_file)[0].close()
+            if meta_file not in readers:
+                reader = FrameReader.attach(meta_file)
+                readers[meta_file] = (reader, stamp, np.empty(reader.shape, dtype=reader.dtype))
+            reader, _, local = readers[meta_file]
+
+            frame = reader.get(request["frame_id"]) or reader.latest()
+            if frame is None:
+                sock.send_json({"seq": request["seq"], "frame_id": request["frame_id"], "count": 0})
+                continue
+            np.copyto(local, frame.image)
+            if not frame.valid():
+                frame, local = reader.read(local)
+
+            image, x0, y0 = local, 0, 0
+            if request["region"]:
+                x1, y1, x2, y2 = request["region"]
+                image, x0, y0 = local[y1:y2, x1:x2], x1, y1
+            boxes = detector.detect([image], request["names"], request["conf"], request["imgsz"])[0]
+
+            count = 0
+            for x1, y1, x2, y2, score, cls in boxes[:args.max_boxes]:
+                out[count] = (x1 + x0, y1 + y0, x2 + x0, y2 + y0, score, cls)
+                count += 1
+            sock.send_json({"seq": request["seq"], "frame_id": frame.frame_id, "count": count})
+        except Exception as e:
+            if isinstance(e, FrameRingError) and meta_file in readers:
+                readers.pop(meta_file)[0].close()
+            sock.send_json({"seq": request["seq"], "error": f"{type(e).__name__}: {e}"})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--address", required=True)
+    parser.add_argument("--results", required=True)
+    parser.add_argument("--max-boxes", type=int, default=32)
+    parser.add_argument("--meta-file", default=META_FILE)
+    parser.add_argument("--detector", default="{}")  # JSON create_detector() keyword arguments
+    parser.add_argument("--factory", default="")  # "module:callable" instead of create_detector
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--parent", type=int, default=0)
+    _worker_main(parser.parse_args())
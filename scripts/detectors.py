@@ -0,0 +1,242 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import cv2
+import numpy as np
+
+# =========================
+# DETECTOR BACKENDS
+# =========================
+# Everything that runs a detector (the in-process tracker path, BatchDetector,
+# pool workers, benchmark.py) goes through the same surface:
+#
+#   detector.detect(images, names, conf, imgsz)
+#       -> per image [(x1, y1, x2, y2, score, index into names), ...] in image pixels
+#   detector.warmup(names)
+#
+# Backends swap their vocabulary and guard their model themselves.
+#   torch: YOLOE under PyTorch with the embeddings cache (the default)
+#   onnx:  the same YOLOE exported to ONNX with its classes baked in, optionally
+#          INT8, run by ONNX Runtime on the CPU; no torch needed at runtime
+class DetectorError(RuntimeError):
+    pass
+
+def normalize_class(name):
+    name = name.strip().strip('"\'').lower()
+    return re.sub(r"\s+", " ", name)
+
+class TorchDetector:
+    def __init__(self, model="models/yoloe.pt", threads=None, cache_dir="models/embeddings", capacity=64):
+        import torch
+        from ultralytics import YOLOE
+        from scripts.embeddings import EmbeddingCache
+        if threads: torch.set_num_threads(threads)
+        self.model = YOLOE(model)
+        self.embeddings = EmbeddingCache(self.model, model_tag=os.path.basename(model),
+                                         cache_dir=cache_dir, capacity=capacity)
+        self.lock = self.embeddings.lock
+        self.vocabularies = {}
+
+    def warmup(self, names):
+        self.embeddings.warmup(names)
+
+    def _vocabulary(self, names):
+        # Same Vocabulary object for the same names, so apply() skips set_classes
+        key = tuple(names)
+        vocab = self.vocabularies.get(key)
+        if vocab is None:
+            if len(self.vocabularies) >= 32: self.vocabularies.clear()
+            vocab = self.vocabularies[key] = self.embeddings.vocabulary(names)
+        return vocab
+
+    def detect(self, images, names, conf=0.2, imgsz=640):
+        vocab = self._vocabulary(names)
+        with self.lock:
+            self.embeddings.apply(vocab)
+            results = self.model.predict(images, conf=conf, imgsz=imgsz, verbose=False)
+        return [[(*box.xyxy[0].tolist(), float(box.conf[0]), int(box.cls[0])) for box in result.boxes]
+                for result in results]
+
+    def stats(self):
+        return {"backend": "torch", **self.embeddings.stats()}
+
+# =========================
+# ONNX EXPORT
+# =========================
+def export_path(onnx_dir, model, names, int8=False):
+    key = hashlib.sha1("\n".join(names).encode()).hexdigest()[:10]
+    stem = os.path.splitext(os.path.basename(model))[0]
+    return os.path.join(onnx_dir, f"{stem}-{key}{'-int8' if int8 else ''}.onnx")
+
+def export_onnx(model="models/yoloe.pt", names=(), onnx_dir="models/onnx", int8=False, imgsz=640):
+    # YOLOE with `names` baked in as its only classes -> ONNX (dynamic batch / size), plus a
+    # .json sidecar listing them. INT8 is dynamic weight quantization, no calibration set needed.
+    from ultralytics import YOLOE
+    names = [normalize_class(n) for n in names]
+    if not names:
+        raise DetectorError("An ONNX export needs at least one class")
+    os.makedirs(onnx_dir, exist_ok=True)
+    path = export_path(onnx_dir, model, names, int8)
+    fp32 = export_path(onnx_dir, model, names)
+
+    if not os.path.exists(fp32):
+        print(f"[DETECTOR] Exporting {model} to ONNX for {len(names)} classes")
+        yoloe = YOLOE(model)
+        yoloe.set_classes(names, yoloe.get_text_pe(names))
+        shutil.move(yoloe.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True), fp32)
+    if int8 and not os.path.exists(path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32, path, weight_type=QuantType.QUInt8)
+
+    for exported, quantized in ((fp32, False), (path, int8)):
+        with open(os.path.splitext(exported)[0] + ".json", "w") as f:
+            json.dump({"model": os.path.basename(model), "names": names, "int8": quantized}, f)
+    return path
+
+# =========================
+# ONNX RUNTIME BACKEND
+# =========================
+def letterbox(image, size):
+    # Same resize + grey padding as ultralytics -> (CHW float32 RGB, scale, pad x, pad y)
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR) if (new_w, new_h) != (w, h) else image
+    padded = cv2.copyMakeBorder(resized, top, size - new_h - top, left, size - new_w - left,
+                                cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    blob = cv2.cvtColor(padded, cv2.COLOR_BGR2RGB).transpose(2, 0, 1).astype(np.float32) / 255.0
+    return blob, scale, left, top
+
+class OnnxDetector:
+    def __init__(self, model="models/yoloe.pt", threads=None, onnx_dir="models/onnx", classes=None, int8=False,
+                 export=True, providers=None, iou=0.7, max_det=100):
+        import onnxruntime as ort
+        self.ort = ort
+        self.model = model
+        self.threads = threads
+        self.onnx_dir = onnx_dir
+        self.classes = [normalize_class(n) for n in classes or []]
+        self.int8 = int8
+        self.export = export
+        self.providers = providers or ["CPUExecutionProvider"]
+        self.iou = iou
+        self.max_det = max_det
+        self.lock = threading.RLock()
+        self.sessions = {}  # path -> (session, input name, baked names)
+        self.exports = 0
+
+    def _options(self):
+        options = self.ort.SessionOptions()
+        options.intra_op_num_threads = self.threads or 0  # 0: ONNX Runtime picks the physical cores
+        options.inter_op_num_threads = 1
+        options.execution_mode = self.ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return options
+
+    def _available(self):
+        # (path, baked names) of every export of this model with the configured precision
+        found = []
+        if not os.path.isdir(self.onnx_dir): return found
+        stem = os.path.splitext(os.path.basename(self.model))[0]
+        for entry in sorted(os.listdir(self.onnx_dir)):
+            if not entry.startswith(stem) or not entry.endswith(".json"): continue
+            with open(os.path.join(self.onnx_dir, entry)) as f:
+                meta = json.load(f)
+            path = os.path.join(self.onnx_dir, entry[:-5] + ".onnx")
+            if meta.get("int8", False) == self.int8 and os.path.exists(path):
+                found.append((path, meta["names"]))
+        return found
+
+    def _session(self, names):
+        # Any export whose baked classes cover `names`; otherwise a new export with the configured
+        # classes plus these (needs torch + ultralytics, so edge boxes should export ahead of time)
+        with self.lock:
+            for path, (session, input_name, baked) in self.sessions.items():
+                if set(names) <= set(baked): return session, input_name, baked
+            candidates = [(path, baked) for path, baked in self._available() if set(names) <= set(baked)]
+            if not candidates:
+                if not self.export:
+                    raise DetectorError(f"No ONNX export in {self.onnx_dir} covers {names}, "
+                                        f"run python -m scripts.detectors --classes ...")
+                baked = list(dict.fromkeys(self.classes + list(names)))
+                candidates = [(export_onnx(self.model, baked, self.onnx_dir, self.int8), baked)]
+                self.exports += 1
+            # The smallest vocabulary is the cheapest head
+            path, baked = min(candidates, key=lambda c: len(c[1]))
+            session = self.ort.InferenceSession(path, self._options(), providers=self.providers)
+            self.sessions[path] = (session, session.get_inputs()[0].name, baked)
+            return self.sessions[path]
+
+    def warmup(self, names):
+        self._session([normalize_class(n) for n in names or self.classes])
+
+    def detect(self, images, names, conf=0.2, imgsz=640):
+        names = [normalize_class(n) for n in names]
+        session, input_name, baked = self._session(names)
+        wanted = np.array([baked.index(n) for n in names])
+        prepared = [letterbox(image, imgsz) for image in images]
+        outputs = session.run(None, {input_name: np.stack([blob for blob, _, _, _ in prepared])})[0]
+        return [self._boxes(prediction, len(baked), wanted, conf, geometry[1:], image.shape)
+                for prediction, geometry, image in zip(outputs, prepared, images)]
+
+    def _boxes(self, prediction, count, wanted, conf, geometry, shape):
+        scale, pad_x, pad_y = geometry
+        if prediction.shape[0] >= 4 + count:
+            # (4 + classes [+ mask coefficients], anchors): cx, cy, w, h then per-class scores
+            scores = prediction[4 + wanted]
+            classes = scores.argmax(axis=0)
+            best = scores[classes, np.arange(scores.shape[1])]
+            keep = best >= conf
+            cx, cy, w, h = prediction[:4, keep]
+            best, classes = best[keep], classes[keep]
+            boxes = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+            indices = cv2.dnn.NMSBoxesBatched(boxes.tolist(), best.tolist(), classes.tolist(), conf, self.iou)
+            indices = np.array(indices, dtype=int).reshape(-1)[:self.max_det]
+            rows = [(*boxes[i], best[i], classes[i]) for i in indices]
+            rows = [(x, y, x + w, y + h, s, c) for x, y, w, h, s, c in rows]
+        else:
+            # End-to-end exports: (detections, 6) rows already through NMS
+            lookup = {int(c): i for i, c in enumerate(wanted)}
+            rows = [(x1, y1, x2, y2, s, lookup[int(c)]) for x1, y1, x2, y2, s, c in prediction
+                    if s >= conf and int(c) in lookup]
+
+        height, width = shape[:2]
+        results = []
+        for x1, y1, x2, y2, score, cls in rows:
+            x1, x2 = [min(max((v - pad_x) / scale, 0.0), width) for v in (x1, x2)]
+            y1, y2 = [min(max((v - pad_y) / scale, 0.0), height) for v in (y1, y2)]
+            results.append((float(x1), float(y1), float(x2), float(y2), float(score), int(cls)))
+        return results
+
+    def stats(self):
+        return {"backend": "onnx", "int8": self.int8, "sessions": len(self.sessions), "exports": self.exports}
+
+# =========================
+# FACTORY
+# =========================
+def create_detector(backend="torch", model="models/yoloe.pt", threads=None, cache_dir="models/embeddings",
+                    capacity=64, onnx_dir="models/onnx", classes=None, int8=False, export=True, providers=None):
+    # Keyword arguments are the `detector` section of config.yaml (+ embeddings cache_dir / capacity)
+    if backend == "torch":
+        return TorchDetector(model, threads, cache_dir, capacity)
+    if backend == "onnx":
+        return OnnxDetector(model, threads, onnx_dir, classes, int8, export, providers)
+    raise DetectorError(f"Unknown detector backend {backend}, expected torch or onnx")
+
+if __name__ == "__main__":
+    # Ahead-of-time export for machines without torch:
+    #   python -m scripts.detectors --classes person "red box" chair --int8
+    parser = argparse.ArgumentParser(description="Export YOLOE to ONNX with baked classes")
+    parser.add_argument("--model", default="models/yoloe.pt")
+    parser.add_argument("--classes", nargs="+", required=True)
+    parser.add_argument("--onnx-dir", default="models/onnx")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true")
+    args = parser.parse_args()
+    print(export_onnx(args.model, args.classes, args.onnx_dir, args.int8, args.imgsz))
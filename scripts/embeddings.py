@@ -0,0 +1,97 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import torch
+
+from scripts.detectors import normalize_class
+
+# =========================
+# CLASS EMBEDDING CACHE
+# =========================
+# YOLOE prompts are text embeddings from the mobileclip encoder. Encoding is the
+# slow part of set_classes, so embeddings are kept per normalized class name in
+# an in-memory LRU backed by one file per class on disk.
+
+class Vocabulary:
+    __slots__ = ("names", "embeddings")
+
+    def __init__(self, names, embeddings):
+        self.names = names
+        self.embeddings = embeddings
+
+class EmbeddingCache:
+    def __init__(self, model, model_tag="yoloe", cache_dir="models/embeddings", capacity=64):
+        self.model = model
+        self.model_tag = model_tag
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # Guards both the LRU and the shared model (set_classes + predict must not interleave)
+        self.lock = threading.RLock()
+        self._active = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, name):
+        key = hashlib.sha1(f"{self.model_tag}:{name}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.pt")
+
+    def _device(self):
+        try: return next(self.model.model.parameters()).device
+        except (AttributeError, StopIteration): return torch.device("cpu")
+
+    def _remember(self, name, embedding):
+        self.entries[name] = embedding
+        self.entries.move_to_end(name)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def get(self, names):
+        # Returns a (1, len(names), dim) tensor, encoding only what neither store has
+        names = [normalize_class(n) for n in names]
+        with self.lock:
+            found = {}
+            missing = []
+            for name in names:
+                if name in self.entries:
+                    self.entries.move_to_end(name)
+                    found[name] = self.entries[name]
+                    self.hits += 1
+                elif os.path.exists(self._path(name)):
+                    found[name] = torch.load(self._path(name), map_location=self._device())
+                    self._remember(name, found[name])
+                    self.disk_hits += 1
+                elif name not in missing:
+                    missing.append(name)
+
+            if missing:
+                self.misses += len(missing)
+                encoded = self.model.get_text_pe(missing)
+                for i, name in enumerate(missing):
+                    embedding = encoded[:, i:i + 1].detach()
+                    torch.save(embedding.cpu(), self._path(name))
+                    self._remember(name, embedding)
+                    found[name] = embedding
+
+            return torch.cat([found[n] for n in names], dim=1)
+
+    def vocabulary(self, names):
+        names = [normalize_class(n) for n in names]
+        return Vocabulary(names, self.get(names))
+
+    def warmup(self, names):
+        if names: self.get(list(names))
+
+    def apply(self, vocab):
+        # Call with self.lock held, right before predict
+        if self._active is not vocab:
+            self.model.set_classes(vocab.names, vocab.embeddings)
+            self._active = vocab
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits,
+                "disk_hits": self.disk_hits, "misses": self.misses}
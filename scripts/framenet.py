@@ -0,0 +1,280 @@
+import struct
+import threading
+import time
+import cv2
+import numpy as np
+import zmq
+
+from scripts import metrics
+from scripts.framering import FrameReader, FrameWriter, FrameRingError, META_FILE, NOTIFY_ADDRESS
+
+# =========================
+# NETWORK FRAME STREAM
+# =========================
+# For Isaac Sim on a render node and main.py elsewhere. nemo.py sends every
+# frame it writes to its ring through a FrameSender (ZMQ PUB); on the other
+# host a NetFrameReader receives them and writes them into a local frame ring,
+# so readers, FrameWaiter and the detector pool work exactly as with shared
+# memory. Each frame is one ZMQ message: the SUB side is CONFLATE, the PUB side
+# has a one message high-water mark, and the sender thread only ever encodes
+# the latest frame, so a slow link or consumer drops to the newest frame
+# instead of queueing.
+#
+# codec: "raw", "jpeg" (image only, extra channels go raw) or "lz4" (needs the
+# optional lz4 package) on the raw bytes of the image and every channel.
+CODECS = ("raw", "jpeg", "lz4")
+
+# magic, frame id, capture timestamp, sim step, codec, height, width, channels, dtype, image bytes, channel count
+HEADER = struct.Struct("<8sQdQ4sIII8sII")
+MAGIC = b"NEMONET\0"
+# per extra channel: name, dtype, ndim, dims, encoded bytes
+CHANNEL = struct.Struct("<16s8sB3xIIII")
+
+def _lz4():
+    try:
+        import lz4.block
+        return lz4.block
+    except ImportError:
+        raise FrameRingError("lz4 frame compression needs the optional lz4 package") from None
+
+def bind_address(address):
+    # "tcp://render-node:5570" -> "tcp://*:5570", what the sending side binds
+    scheme, _, rest = address.partition("://")
+    return f"{scheme}://*:{rest.rsplit(':', 1)[1]}" if scheme == "tcp" else address
+
+# =========================
+# SENDER (nemo.py side)
+# =========================
+class FrameSender:
+    def __init__(self, address, codec="raw", quality=90):
+        if codec not in CODECS:
+            raise FrameRingError(f"Unknown frame codec {codec}, expected one of {CODECS}")
+        self.codec = codec
+        self.quality = quality
+        self.lz4 = _lz4() if codec == "lz4" else None
+        self.sock = zmq.Context.instance().socket(zmq.PUB)
+        self.sock.setsockopt(zmq.SNDHWM, 1)
+        self.sock.setsockopt(zmq.LINGER, 0)
+        self.sock.bind(bind_address(address))
+
+        # Latest-only handoff: send() copies into `pending`, the thread swaps it with `working`
+        self.cond = threading.Condition()
+        self.pending = None
+        self.working = None
+        self.has_pending = False
+        self.sent = 0
+        self.skipped = 0
+        self.bytes = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="frame-sender", daemon=True)
+        self._thread.start()
+
+    def send(self, image, frame_id, timestamp, sim_step=0, channels=None):
+        # Called right after FrameWriter.commit(); never blocks on the network
+        with self.cond:
+            if self.pending is None:
+                self.names = list(channels or {})
+                self.pending = (self._buffers(image, channels), None)
+                self.working = (self._buffers(image, channels), None)
+            if self.has_pending: self.skipped += 1
+            arrays, _ = self.pending
+            np.copyto(arrays[0], image)
+            for array, source in zip(arrays[1:], (channels or {}).values()):
+                np.copyto(array, source)
+            self.pending = (arrays, (frame_id, timestamp, sim_step))
+            self.has_pending = True
+            self.cond.notify()
+
+    def _buffers(self, image, channels):
+        return [np.empty_like(image)] + [np.empty_like(np.asarray(c)) for c in (channels or {}).values()]
+
+    def _encode(self, array, image):
+        if self.codec == "jpeg" and image:
+            ok, data = cv2.imencode(".jpg", array, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ok: raise FrameRingError("JPEG encoding failed")
+            return data
+        if self.codec == "lz4":
+            return self.lz4.compress(np.ascontiguousarray(array), store_size=False)
+        return np.ascontiguousarray(array)
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while self._running and not self.has_pending:
+                    self.cond.wait()
+                if not self._running: return
+                self.pending, self.working = self.working, self.pending
+                self.has_pending = False
+            arrays, (frame_id, timestamp, sim_step) = self.working
+
+            with metrics.span("net_encode", codec=self.codec):
+                image = arrays[0]
+                h, w = image.shape[:2]
+                c = image.shape[2] if image.ndim == 3 else 1
+                parts = [self._encode(image, True)]
+                tables = []
+                for name, array in zip(self.names, arrays[1:]):
+                    data = self._encode(array, False)
+                    dims = (list(array.shape) + [0, 0, 0])[:3]
+                    tables.append(CHANNEL.pack(name.encode(), array.dtype.str.encode(), array.ndim, *dims,
+                                               memoryview(data).nbytes))
+                    parts.append(data)
+                header = HEADER.pack(MAGIC, frame_id, timestamp, sim_step, self.codec.encode(), h, w, c,
+                                     image.dtype.str.encode(), memoryview(parts[0]).nbytes, len(tables))
+                message = b"".join([header, *tables, *(memoryview(p).cast("B") for p in parts)])
+            try:
+                self.sock.send(message, zmq.NOBLOCK, copy=False)
+                self.sent += 1
+                self.bytes += len(message)
+            except zmq.Again:
+                self.skipped += 1
+
+    def stats(self):
+        return {"codec": self.codec, "sent": self.sent, "skipped": self.skipped,
+                "mean_kb": self.bytes / self.sent / 1024 if self.sent else 0.0}
+
+    def close(self):
+        with self.cond:
+            self._running = False
+            self.cond.notify()
+        self._thread.join(timeout=1.0)
+        self.sock.close()
+
+# =========================
+# RECEIVER (main.py side)
+# =========================
+class _Receiver:
+    # SUB socket -> decode -> local FrameWriter ring, on its own thread
+    def __init__(self, address, meta_file, notify_address):
+        self.address = address
+        self.meta_file = meta_file
+        self.notify_address = notify_address
+        self.writer = None
+        self.ready = threading.Event()
+        self.received = 0
+        self.missed = 0     # frame ids the sender published that never got decoded here
+        self.errors = 0
+        self.last_id = None
+        self.remote = []    # per local slot: (sender frame id, sender timestamp) of the frame in it
+        self.lz4 = None
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="frame-receiver", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        sock = zmq.Context.instance().socket(zmq.SUB)
+        sock.setsockopt(zmq.CONFLATE, 1)
+        sock.setsockopt(zmq.LINGER, 0)
+        sock.setsockopt(zmq.SUBSCRIBE, b"")
+        sock.connect(self.address)
+        try:
+            while self._running:
+                if not sock.poll(200): continue
+                message = sock.recv(copy=False)
+                received = time.time()
+                try:
+                    with metrics.span("net_decode"):
+                        self._write(message.buffer, received)
+                except Exception as e:
+                    self.errors += 1
+                    if self.errors == 1 or self.errors % 100 == 0:
+                        print(f"[FRAMES] Dropped a network frame: {type(e).__name__}: {e}")
+        finally:
+            sock.close()
+
+    def _decode(self, codec, data, dst, image):
+        if codec == "jpeg" and image:
+            flags = cv2.IMREAD_COLOR if dst.ndim == 3 else cv2.IMREAD_GRAYSCALE
+            np.copyto(dst, cv2.imdecode(np.frombuffer(data, np.uint8), flags).reshape(dst.shape))
+        elif codec == "lz4":
+            self.lz4 = self.lz4 or _lz4()
+            np.copyto(dst, np.frombuffer(self.lz4.decompress(data, uncompressed_size=dst.nbytes),
+                                         dst.dtype).reshape(dst.shape))
+        else:
+            np.copyto(dst, np.frombuffer(data, dst.dtype).reshape(dst.shape))
+
+    def _write(self, buf, received=None):
+        magic, frame_id, timestamp, sim_step, codec, h, w, c, dtype, image_bytes, count = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise FrameRingError("not a Nemo frame message")
+        codec = codec.rstrip(b"\0").decode()
+        dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        offset = HEADER.size
+        tables = []
+        for _ in range(count):
+            name, ch_dtype, ndim, d0, d1, d2, nbytes = CHANNEL.unpack_from(buf, offset)
+            tables.append((name.rstrip(b"\0").decode(), np.dtype(ch_dtype.rstrip(b"\0").decode()),
+                           (d0, d1, d2)[:ndim], nbytes))
+            offset += CHANNEL.size
+
+        shape = (h, w, c)
+        if self.writer is None:
+            # The first frame decides the local ring layout
+            self.writer = FrameWriter(shape, dtype, slots=4, meta_file=self.meta_file,
+                                      notify_address=self.notify_address,
+                                      channels={name: (dims, ch_dtype) for name, ch_dtype, dims, _ in tables})
+            self.remote = [(0, 0.0)] * self.writer.slots
+            self.ready.set()
+        elif shape != self.writer.shape or dtype != self.writer.dtype:
+            raise FrameRingError(f"frame layout changed to {shape} {dtype}, restart the reader")
+
+        if self.last_id is not None and frame_id > self.last_id + 1:
+            self.missed += frame_id - self.last_id - 1
+        self.last_id = frame_id
+
+        # Local ids stay sequential: the sender's skip whenever frames are conflated, and a skipped
+        # id could land on the slot of the latest frame while readers still use it
+        view = memoryview(buf)
+        try:
+            self._decode(codec, view[offset:offset + image_bytes], self.writer.begin(), True)
+            offset += image_bytes
+            for name, _, _, nbytes in tables:
+                if name in self.writer.channels:
+                    self._decode(codec, view[offset:offset + nbytes], self.writer.channel(name), False)
+                offset += nbytes
+        except Exception:
+            # A corrupt packet must not leave its slot marked busy, readers would spin on it
+            self.writer.abort()
+            raise
+        # Frames are stamped with this host's receive time: the sender's clock may be skewed, and
+        # the follow controller ages observations by these timestamps. The sender's capture time
+        # is only kept for latency measurements (meaningful with synchronized clocks).
+        received = time.time() if received is None else received
+        metrics.observe("net_delay", received - timestamp)
+        self.remote[(self.writer.frame_id + 1) % self.writer.slots] = (frame_id, timestamp)
+        self.writer.commit(received, sim_step)
+        self.received += 1
+
+    def close(self):
+        self._running = False
+        self._thread.join(timeout=1.0)
+        if self.writer is not None:
+            self.writer.close()
+
+class NetFrameReader(FrameReader):
+    # Same API as FrameReader; connect() raises FrameRingError until the first frame arrived
+    @classmethod
+    def connect(cls, address, meta_file=META_FILE, notify_address=NOTIFY_ADDRESS, timeout=1.0):
+        receiver = _Receiver(address, meta_file, notify_address)
+        if not receiver.ready.wait(timeout):
+            receiver.close()
+            raise FrameRingError(f"No frames from {address} yet")
+        reader = cls.attach(meta_file)
+        reader.receiver = receiver
+        return reader
+
+    @property
+    def name(self):
+        return self.receiver.address
+
+    def remote(self, frame):
+        # -> (sender frame id, sender timestamp) of a frame from this reader, None once its slot was reused
+        remote = self.receiver.remote[frame.slot]
+        return remote if frame.valid() else None
+
+    def stats(self):
+        return {"received": self.receiver.received, "missed": self.receiver.missed, "errors": self.receiver.errors}
+
+    def close(self):
+        super().close()
+        self.receiver.close()
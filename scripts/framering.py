@@ -0,0 +1,317 @@
+from multiprocessing import shared_memory
+import os
+import struct
+import time
+import zmq
+import numpy as np
+
+# =========================
+# SEGMENT LAYOUT
+# =========================
+# [segment header][channel table][slot 0 header | pixels | extra channels][slot 1 ...]...
+#
+# The writer fills slot (latest + 1) % slots, so the slot holding the latest
+# frame is never touched while readers look at it. Each slot carries a seqlock
+# counter: odd while the writer is inside it, even once the frame is complete.
+# Extra channels (motion vectors, depth...) live in the same slot and are
+# covered by the same counter.
+META_FILE = "scripts/Apdata.txt"
+NOTIFY_ADDRESS = "tcp://127.0.0.1:5556"
+MAGIC = b"NEMOFRM\0"
+VERSION = 2
+ALIGN = 64
+
+# magic, version, slots, height, width, channels, dtype, slot stride, data offset
+SEGMENT = struct.Struct("<8sHHIII8sQQ")
+LATEST = struct.Struct("<Q")
+LATEST_OFFSET = SEGMENT.size
+SEGMENT_SIZE = ALIGN
+
+# channel count, then per channel: name, dtype, ndim, dims, offset inside the slot
+CHANNEL_COUNT = struct.Struct("<I")
+CHANNEL = struct.Struct("<16s8sB3xIIIQ")
+
+# seq, frame id, capture timestamp, sim step
+SLOT = struct.Struct("<QQdQ")
+SLOT_HEADER_SIZE = ALIGN
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+class FrameRingError(RuntimeError):
+    pass
+
+_created = set()  # segments this process owns (and will unlink itself)
+
+def attach_segment(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # Python < 3.13 also tracks attached segments and unlinks them when the
+    # attaching process exits, which would pull the ring from under the writer
+    if os.name == "posix" and shm.name not in _created:
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+# =========================
+# FRAME HANDLE
+# =========================
+class Frame:
+    __slots__ = ("image", "frame_id", "timestamp", "sim_step", "slot", "_seq", "_ring")
+
+    def __init__(self, ring, slot, seq, frame_id, timestamp, sim_step, image):
+        self._ring = ring
+        self.slot = slot
+        self._seq = seq
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.sim_step = sim_step
+        self.image = image
+
+    @property
+    def age(self):
+        return time.time() - self.timestamp
+
+    def valid(self):
+        # True while the writer has not started reusing this slot
+        return self._ring._slot_seq(self.slot) == self._seq
+
+    def channel(self, name):
+        # Zero-copy view of an extra channel of this frame, same validity rules as `image`
+        return self._ring.channels[name][self.slot]
+
+# =========================
+# SHARED RING
+# =========================
+class _Ring:
+    def __init__(self, shm, slots, shape, dtype, slot_stride, data_offset, channels=None):
+        self.shm = shm
+        self.buf = shm.buf
+        self.slots = slots
+        self.shape = shape
+        self.dtype = dtype
+        self.slot_stride = slot_stride
+        self.data_offset = data_offset
+        self.images = [
+            np.ndarray(shape, dtype=dtype, buffer=self.buf,
+                       offset=data_offset + i * slot_stride + SLOT_HEADER_SIZE)
+            for i in range(slots)
+        ]
+        # name -> (shape, dtype, offset in slot), views per slot
+        self.channel_layout = channels or {}
+        self.channels = {
+            name: [np.ndarray(ch_shape, dtype=ch_dtype, buffer=self.buf, offset=data_offset + i * slot_stride + offset)
+                   for i in range(slots)]
+            for name, (ch_shape, ch_dtype, offset) in self.channel_layout.items()
+        }
+
+    def _slot_offset(self, slot):
+        return self.data_offset + slot * self.slot_stride
+
+    def _slot_seq(self, slot):
+        return LATEST.unpack_from(self.buf, self._slot_offset(slot))[0]
+
+    def _slot_header(self, slot):
+        return SLOT.unpack_from(self.buf, self._slot_offset(slot))
+
+    def latest_id(self):
+        return LATEST.unpack_from(self.buf, LATEST_OFFSET)[0]
+
+class FrameWriter(_Ring):
+    # channels: optional {name: (shape, dtype)} published alongside every image
+    def __init__(self, shape, dtype=np.uint8, slots=4, meta_file=META_FILE, notify_address=NOTIFY_ADDRESS,
+                 channels=None):
+        dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(shape)) * dtype.itemsize
+        slot_size = SLOT_HEADER_SIZE + _align(frame_bytes)
+        layout = {}
+        for name, (ch_shape, ch_dtype) in (channels or {}).items():
+            ch_shape, ch_dtype = tuple(ch_shape), np.dtype(ch_dtype)
+            if len(ch_shape) > 3 or len(name.encode()) > 16:
+                raise FrameRingError(f"Unsupported channel {name} {ch_shape}")
+            layout[name] = (ch_shape, ch_dtype, slot_size)
+            slot_size += _align(int(np.prod(ch_shape)) * ch_dtype.itemsize)
+        slot_stride = slot_size
+        data_offset = _align(SEGMENT_SIZE + CHANNEL_COUNT.size + len(layout) * CHANNEL.size)
+        shm = shared_memory.SharedMemory(create=True, size=data_offset + slots * slot_stride)
+        _created.add(shm.name)
+
+        h, w, c = shape
+        SEGMENT.pack_into(shm.buf, 0, MAGIC, VERSION, slots, h, w, c,
+                          dtype.str.encode(), slot_stride, data_offset)
+        LATEST.pack_into(shm.buf, LATEST_OFFSET, 0)
+        CHANNEL_COUNT.pack_into(shm.buf, SEGMENT_SIZE, len(layout))
+        for i, (name, (ch_shape, ch_dtype, offset)) in enumerate(layout.items()):
+            dims = (list(ch_shape) + [0, 0, 0])[:3]
+            CHANNEL.pack_into(shm.buf, SEGMENT_SIZE + CHANNEL_COUNT.size + i * CHANNEL.size,
+                              name.encode(), ch_dtype.str.encode(), len(ch_shape), *dims, offset)
+        for i in range(slots):
+            SLOT.pack_into(shm.buf, data_offset + i * slot_stride, 0, 0, 0.0, 0)
+
+        super().__init__(shm, slots, tuple(shape), dtype, slot_stride, data_offset, layout)
+        self.meta_file = meta_file
+        self.frame_id = 0
+        self._open_slot = None
+
+        # New-frame ticks so consumers can block instead of polling the header
+        self.notify = None
+        if notify_address:
+            self.notify = zmq.Context.instance().socket(zmq.PUB)
+            self.notify.setsockopt(zmq.SNDHWM, 1)
+            self.notify.setsockopt(zmq.LINGER, 0)
+            self.notify.bind(notify_address)
+
+        # The segment describes itself, the meta file only tells readers where it is
+        # and where its new-frame ticks are published (one address per camera)
+        with open(meta_file, "w") as f:
+            f.write(f"{shm.name}\n{notify_address or ''}\n")
+
+    def begin(self):
+        # Returns the destination array of the next slot, already marked busy
+        slot = (self.frame_id + 1) % self.slots
+        offset = self._slot_offset(slot)
+        # `| 1`: a slot left odd by an earlier failed write must not flip the parity for good
+        seq = self._slot_seq(slot) | 1
+        LATEST.pack_into(self.buf, offset, seq)
+        self._open_slot = (slot, seq + 1)
+        return self.images[slot]
+
+    def abort(self):
+        # Gives up the slot opened by begin(): even again, but holding no frame (it is half written)
+        if self._open_slot is None: return
+        slot, seq = self._open_slot
+        self._open_slot = None
+        offset = self._slot_offset(slot)
+        SLOT.pack_into(self.buf, offset, seq - 1, 0, 0.0, 0)
+        LATEST.pack_into(self.buf, offset, seq)
+
+    def channel(self, name):
+        # Destination of an extra channel in the slot opened by begin()
+        return self.channels[name][self._open_slot[0]]
+
+    def commit(self, timestamp=None, sim_step=0):
+        slot, seq = self._open_slot
+        self._open_slot = None
+        self.frame_id += 1
+        offset = self._slot_offset(slot)
+        SLOT.pack_into(self.buf, offset, seq - 1, self.frame_id,
+                       time.time() if timestamp is None else timestamp, sim_step)
+        LATEST.pack_into(self.buf, offset, seq)
+        LATEST.pack_into(self.buf, LATEST_OFFSET, self.frame_id)
+        if self.notify is not None:
+            try: self.notify.send(LATEST.pack(self.frame_id), zmq.NOBLOCK)
+            except zmq.Again: pass
+        return self.frame_id
+
+    def write(self, image, timestamp=None, sim_step=0):
+        np.copyto(self.begin(), image)
+        return self.commit(timestamp, sim_step)
+
+    def close(self):
+        if self.notify is not None:
+            self.notify.close()
+        self.images = []
+        self.channels = {}
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+class FrameReader(_Ring):
+    @classmethod
+    def attach(cls, meta_file=META_FILE):
+        with open(meta_file, "r") as f:
+            name = f.readline().strip()
+            notify_address = f.readline().strip() or NOTIFY_ADDRESS
+        shm = attach_segment(name)
+        magic, version, slots, h, w, c, dtype, slot_stride, data_offset = SEGMENT.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            shm.close()
+            raise FrameRingError(f"Unsupported frame segment {name} (version {version})")
+        dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        layout = {}
+        for i in range(CHANNEL_COUNT.unpack_from(shm.buf, SEGMENT_SIZE)[0]):
+            name, ch_dtype, ndim, d0, d1, d2, offset = CHANNEL.unpack_from(
+                shm.buf, SEGMENT_SIZE + CHANNEL_COUNT.size + i * CHANNEL.size)
+            layout[name.rstrip(b"\0").decode()] = ((d0, d1, d2)[:ndim], np.dtype(ch_dtype.rstrip(b"\0").decode()), offset)
+        reader = cls(shm, slots, (h, w, c), dtype, slot_stride, data_offset, layout)
+        reader.notify_address = notify_address
+        return reader
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def latest(self):
+        # Zero-copy view of the newest complete frame, or None before the first one
+        while True:
+            frame_id = self.latest_id()
+            if frame_id == 0:
+                return None
+            slot = frame_id % self.slots
+            seq, slot_frame, timestamp, sim_step = self._slot_header(slot)
+            if seq & 1 or slot_frame != frame_id:
+                continue
+            frame = Frame(self, slot, seq, frame_id, timestamp, sim_step, self.images[slot])
+            # Header fields must belong to the same write as the seq we saw
+            if frame.valid():
+                return frame
+
+    def get(self, frame_id):
+        # Zero-copy view of a specific frame while its slot still holds it, else None
+        slot = frame_id % self.slots
+        seq, slot_frame, timestamp, sim_step = self._slot_header(slot)
+        if seq & 1 or slot_frame != frame_id:
+            return None
+        frame = Frame(self, slot, seq, frame_id, timestamp, sim_step, self.images[slot])
+        return frame if frame.valid() else None
+
+    def read(self, out=None):
+        # Consistent copy of the newest frame into `out` (allocated when None)
+        while True:
+            frame = self.latest()
+            if frame is None:
+                return None, out
+            if out is None:
+                out = np.empty(self.shape, dtype=self.dtype)
+            np.copyto(out, frame.image)
+            if frame.valid():
+                return frame, out
+
+    def close(self):
+        self.images = []
+        self.channels = {}
+        self.buf = None
+        self.shm.close()
+
+# =========================
+# NEW FRAME WAKEUPS
+# =========================
+class FrameWaiter:
+    # One per consumer thread, ZMQ sockets must not be shared between threads.
+    # Without a publisher it degrades to polling the header every `fallback_poll`.
+    def __init__(self, reader, address=None, fallback_poll=0.05):
+        self.reader = reader
+        self.fallback_poll = fallback_poll
+        self.sock = zmq.Context.instance().socket(zmq.SUB)
+        self.sock.setsockopt(zmq.CONFLATE, 1)
+        self.sock.setsockopt(zmq.LINGER, 0)
+        self.sock.setsockopt(zmq.SUBSCRIBE, b"")
+        self.sock.connect(address or getattr(reader, "notify_address", NOTIFY_ADDRESS))
+
+    def wait(self, last_id=0, timeout=1.0):
+        # Blocks until a frame newer than `last_id` is complete, None on timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            frame = self.reader.latest()
+            if frame is not None and frame.frame_id != last_id:
+                return frame
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if self.sock.poll(int(min(remaining, self.fallback_poll) * 1000) + 1):
+                self.sock.recv()
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,128 @@
+import re
+
+# =========================
+# COMMAND LIST FROM CONFIG.TXT
+# =========================
+# "- Move forward: *forward*" -> "forward", "*target "TargetName"*" -> "target"
+def load_persona_rules(persona):
+    names = set()
+    for line in persona.splitlines():
+        match = re.match(r"\s*-\s*[^:]+:\s*\*([^*]+)\*", line)
+        if match:
+            names.add(match.group(1).split()[0].lower())
+
+    speed = re.search(r"speed of (\d+(?:\.\d+)?) meters? per second", persona)
+    turn = re.search(r"turn for (\d+(?:\.\d+)?) degrees? per (\d+(?:\.\d+)?)\s*s", persona)
+    return {
+        "commands": names,
+        "meters_per_second": float(speed.group(1)) if speed else 10.0,
+        "degrees_per_second": float(turn.group(1)) / float(turn.group(2)) if turn else 24.0,
+    }
+
+# =========================
+# GRAMMAR
+# =========================
+POLITE = re.compile(r"^(?:(?:ok(?:ay)?|hey|jarvis|please|now|just|can you|could you|would you|will you)\s+)+|"
+                    r"(?:\s+(?:please|now|jarvis|thanks|thank you))+$")
+DIRECTIONS = {"forward": "forward", "forwards": "forward", "ahead": "forward", "straight": "forward",
+              "backward": "backward", "backwards": "backward", "back": "backward",
+              "left": "left", "right": "right"}
+MOTION = re.compile(r"^(?:move|go|drive|turn|rotate|head)?\s*(?:to the\s+)?(" + "|".join(DIRECTIONS) + r")"
+                    r"(?:\s+(?:for\s+)?(\d+(?:\.\d+)?)\s*(s|sec|secs|seconds?|m|meters?|metres?|deg|degrees?)?)?$")
+STOP = re.compile(r"^(?:stop|halt|freeze|stop moving|stop now|emergency stop|stay|stay there)$")
+FASTER = re.compile(r"^(?:speed up|faster|go faster|move faster|speed \+)$")
+SLOWER = re.compile(r"^(?:slow down|slower|go slower|move slower|speed -)$")
+# "go to / move to" can be places or actions ("go to sleep"), those go to the VLM
+FOLLOW = re.compile(r"^(?:follow|track|chase)\s+(?:(?:the|that|this|a|an)\s+)?([a-z][a-z ]*)$")
+# "follow me", "track it": no class name for the detector
+PRONOUNS = {"me", "us", "you", "it", "him", "her", "them", "that", "this", "these", "those", "one",
+            "there", "here", "someone", "something", "everyone"}
+VISION = re.compile(r"^(?:share|show)\s+(?:us\s+|me\s+)?your\s+(?:vision|view|point of view)$")
+# Words that make a request conditional or conversational, those go to the VLM
+AMBIGUOUS = {"if", "when", "unless", "until", "what", "why", "how", "where", "which", "who", "see", "think",
+             "maybe", "careful", "wall", "safe", "should", "not", "don", "dont"}
+SPLIT = re.compile(r"\s*(?:,|;|\bthen\b|\band then\b|\band\b)\s*")
+
+class IntentParser:
+    def __init__(self, persona, is_moving=lambda: True, log=False):
+        rules = load_persona_rules(persona)
+        self.commands = rules["commands"]
+        self.meters_per_second = rules["meters_per_second"]
+        self.degrees_per_second = rules["degrees_per_second"]
+        self.is_moving = is_moving
+        self.log = log
+        self.turns = 0
+        self.fast = 0
+
+    def _normalize(self, text):
+        text = text.lower().replace("'", " ")
+        text = re.sub(r"[^\w\s.+,;-]", " ", text)
+        text = " ".join(text.split()).strip(" .")
+        previous = None
+        while previous != text:
+            previous, text = text, POLITE.sub("", text).strip(" .")
+        return text
+
+    def _parse_one(self, text):
+        # -> (command, spoken confirmation) or None
+        text = self._normalize(text)
+        if not text:
+            return None
+        if STOP.match(text):
+            return "stop", "Stopping."
+
+        match = MOTION.match(text)
+        if match:
+            direction = DIRECTIONS[match.group(1)]
+            amount, unit = match.group(2), (match.group(3) or "s")
+            if amount is None:
+                return direction, f"Moving {direction}."
+            amount = float(amount)
+            if unit.startswith("m"):
+                if direction in ("left", "right"): return None
+                seconds = amount / self.meters_per_second
+            elif unit.startswith("d"):
+                if direction not in ("left", "right"): return None
+                seconds = amount / self.degrees_per_second
+            else:
+                seconds = amount
+            return f"{direction} {seconds:g}", f"Moving {direction} for {seconds:g}s."
+
+        if FASTER.match(text) or SLOWER.match(text):
+            # Same rule as the persona: no speed change while stationary
+            if not self.is_moving(): return None
+            return ("speed +", "Speeding up.") if FASTER.match(text) else ("speed -", "Slowing down.")
+
+        if VISION.match(text):
+            return "vision", "Sharing my vision."
+
+        match = FOLLOW.match(text)
+        if match and len(match.group(1).split()) <= 4 and match.group(1).split()[0] not in PRONOUNS:
+            target = match.group(1).strip()
+            return f"target {target}", f"Following the {target}."
+        return None
+
+    def parse(self, text):
+        # -> ([commands], reply) when every part of the utterance is unambiguous, else None
+        lowered = text.lower()
+        if "?" in text or set(re.findall(r"[a-z]+", lowered)) & AMBIGUOUS:
+            return None
+
+        pieces = [p for p in SPLIT.split(self._normalize(text)) if p]
+        parsed = [self._parse_one(p) for p in pieces]
+        if not parsed or any(p is None for p in parsed):
+            # "follow salt and pepper" style targets: try the whole utterance once
+            whole = self._parse_one(text)
+            if whole is None: return None
+            parsed = [whole]
+
+        commands = [command for command, _ in parsed]
+        if any(command.split()[0] not in self.commands for command in commands):
+            return None
+        return commands, " ".join(reply for _, reply in parsed)
+
+    def record(self, fast):
+        self.turns += 1
+        self.fast += int(fast)
+        if self.log:
+            print(f"[FAST PATH] {self.fast}/{self.turns} turns ({self.fast / self.turns:.0%}) took the local path")
@@ -0,0 +1,62 @@
+import base64
+import time
+import cv2
+
+# =========================
+# IN-MEMORY FRAME ENCODING
+# =========================
+FORMATS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+class EncodedMedia:
+    # Ready-to-send attachment, accepted by Nvidia._prepare_content next to file paths
+    __slots__ = ("data", "mime", "kind", "stats")
+
+    def __init__(self, data, mime, kind="image_url", stats=None):
+        self.data = data
+        self.mime = mime
+        self.kind = kind
+        self.stats = stats or {}
+
+    def data_url(self):
+        return f"data:{self.mime};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+def fit_size(width, height, max_width, max_height):
+    scale = min(1.0, max_width / width, max_height / height)
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+def encode_frame(image, max_width=768, max_height=576, quality=80, fmt="jpeg"):
+    start = time.perf_counter()
+    ext, mime, flag = FORMATS[fmt]
+    h, w = image.shape[:2]
+    size = fit_size(w, h, max_width, max_height)
+    if size != (w, h):
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    ok, buf = cv2.imencode(ext, image, [flag, int(quality)])
+    if not ok:
+        raise ValueError(f"Could not encode frame as {fmt}")
+    data = buf.tobytes()
+    stats = {
+        "width": size[0], "height": size[1], "format": fmt, "quality": quality,
+        "bytes": len(data), "encode_ms": (time.perf_counter() - start) * 1000,
+    }
+    return EncodedMedia(data, mime, "image_url", stats)
+
+def encode_latest(reader, **options):
+    # Encodes straight from the ring slot, retries if the writer lapped us meanwhile
+    for _ in range(3):
+        frame = reader.latest()
+        if frame is None:
+            return None
+        encoded = encode_frame(frame.image, **options)
+        if frame.valid():
+            return encoded
+    frame, copy = reader.read()
+    return encode_frame(copy, **options) if frame is not None else None
+
+def describe(stats):
+    return (f"{stats['width']}x{stats['height']} {stats['format']} q{stats['quality']} "
+            f"{stats['bytes'] / 1024:.1f} KB in {stats['encode_ms']:.1f} ms")
@@ -0,0 +1,177 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bisect
+import json
+import os
+import queue
+import threading
+import time
+
+# Per-stage latency instrumentation. Off by default: span()/observe() then
+# return after a single flag check, so call sites stay in place permanently.
+#
+#   with metrics.span("detect"): ...
+#   metrics.observe("frame_age", frame.age)
+#
+# Enabled, every value lands in a histogram (Prometheus text on
+# http://127.0.0.1:<port>/metrics) and, for spans, in a JSONL trace file.
+
+# =========================
+# STATE
+# =========================
+active = False
+process_name = "main"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_trace = None
+_server = None
+
+# =========================
+# HISTOGRAMS
+# =========================
+class Histogram:
+    def __init__(self, name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self, prefix="nemo"):
+        name = f"{prefix}_{self.name}_seconds"
+        lines = [f"# TYPE {name} histogram"]
+        with self.lock:
+            total = 0
+            for bound, count in zip(self.buckets, self.counts):
+                total += count
+                lines.append(f'{name}_bucket{{process="{process_name}",le="{bound}"}} {total}')
+            lines.append(f'{name}_bucket{{process="{process_name}",le="+Inf"}} {self.count}')
+            lines.append(f'{name}_sum{{process="{process_name}"}} {self.sum}')
+            lines.append(f'{name}_count{{process="{process_name}"}} {self.count}')
+        return lines
+
+def _histogram(name):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault(name, Histogram(name))
+    return histogram
+
+# =========================
+# RECORDING
+# =========================
+class _NoSpan:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+NO_SPAN = _NoSpan()
+
+class _Span:
+    __slots__ = ("name", "labels", "start", "wall")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        _histogram(self.name).observe(duration)
+        if _trace is not None:
+            _trace.put((self.name, self.wall, duration, threading.current_thread().name, self.labels))
+        return False
+
+def span(name, **labels):
+    if not active:
+        return NO_SPAN
+    return _Span(name, labels)
+
+def observe(name, seconds):
+    # For durations measured elsewhere (ack round trips, frame age...)
+    if active:
+        _histogram(name).observe(seconds)
+
+def count(name, n=1):
+    if active:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+def render():
+    lines = []
+    for histogram in list(_histograms.values()):
+        lines.extend(histogram.render())
+    for name, value in list(_counters.items()):
+        lines.append(f"# TYPE nemo_{name}_total counter")
+        lines.append(f'nemo_{name}_total{{process="{process_name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def summary():
+    # {name: (count, mean seconds)} for quick prints
+    return {name: (h.count, h.sum / h.count if h.count else 0.0) for name, h in list(_histograms.items())}
+
+# =========================
+# EXPORT
+# =========================
+def _write_trace(path, events):
+    # One JSON object per span; several processes may append to the same file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", buffering=1) as f:
+        while True:
+            name, wall, duration, thread, labels = events.get()
+            record = {"name": name, "ts": wall, "dur": duration, "process": process_name, "thread": thread}
+            if labels: record.update(labels)
+            f.write(json.dumps(record) + "\n")
+
+def _serve(port):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            data = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def configure(enabled=False, trace_file=None, port=None, sim_port=None, process="main"):
+    # Called once from the `metrics` section of config.yaml; nemo.py passes process="nemo"
+    # and exposes its endpoint on sim_port so both processes can run side by side
+    global active, _trace, _server, process_name
+    process_name = process
+    active = enabled
+    if not enabled:
+        return
+    if trace_file and _trace is None:
+        _trace = queue.SimpleQueue()
+        threading.Thread(target=_write_trace, args=(trace_file, _trace), daemon=True).start()
+    port = sim_port if process == "nemo" else port
+    if port and _server is None:
+        try:
+            _server = _serve(port)
+            print(f"[METRICS] http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"[METRICS] Could not serve on port {port}: {e}")
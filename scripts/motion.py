@@ -0,0 +1,154 @@
+from collections import deque
+import heapq
+import itertools
+import threading
+import time
+
+# =========================
+# CANCELLATION
+# =========================
+class CancelToken:
+    # Handle for one submitted plan. cancel() stops it if it is still running.
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+# =========================
+# MOTION SCHEDULER
+# =========================
+class MotionScheduler:
+    # One thread and a timer heap for every motion command. A plan is an ordered
+    # list of (left, right, duration) steps: timed steps run back to back and the
+    # robot stops after the last one; an untimed step holds until the next step
+    # (or forever when it is last). Submitting a new plan replaces the running one.
+    def __init__(self, send, log=True):
+        self.send = send
+        self.log = log
+        self.cond = threading.Condition()
+        self.timers = []  # (due, order, token, action)
+        self.order = itertools.count()
+        self.token = None
+        self.steps = deque()
+        self.left = 0.0
+        self.right = 0.0
+        self.thread = threading.Thread(target=self._loop, name="motion", daemon=True)
+        self.thread.start()
+
+    # =========================
+    # API
+    # =========================
+    def submit(self, steps, deadline=None):
+        # -> CancelToken. deadline: seconds after which the whole plan is stopped
+        with self.cond:
+            if self.token is not None:
+                self._finish(self.token, cancelled=True)
+            token = CancelToken(self)
+            self.token = token
+            self.steps = deque(steps)
+            now = time.monotonic()
+            if deadline is not None:
+                self._schedule(now + deadline, token, "deadline")
+            self._next(now)
+            self.cond.notify()
+            return token
+
+    def append(self, token, steps):
+        # Adds steps to a running plan, in order. Restarts it if it already ran out.
+        with self.cond:
+            if token.cancelled or token is not self.token:
+                return False
+            # Finished, or holding an untimed step: the new steps start right away
+            restart = not self.steps and not self._pending(token)
+            self.steps.extend(steps)
+            if restart:
+                token.done.clear()
+                self._next(time.monotonic())
+                self.cond.notify()
+            return True
+
+    def cancel(self, token=None):
+        # Stops `token` (or whatever runs) and brings the robot to a halt
+        with self.cond:
+            token = token or self.token
+            if token is not None:
+                self._finish(token, cancelled=True)
+            if token is None or token is self.token:
+                self.steps.clear()
+                self._set(0.0, 0.0)
+
+    def scale(self, factor):
+        # Atomically scales the current speed and the queued steps, False when stationary
+        with self.cond:
+            if self.left == 0 and self.right == 0:
+                return False
+            self.steps = deque((l * factor, r * factor, d) for l, r, d in self.steps)
+            self._set(self.left * factor, self.right * factor)
+            return True
+
+    def current(self):
+        with self.cond:
+            return self.left, self.right
+
+    def moving(self):
+        left, right = self.current()
+        return left != 0 or right != 0
+
+    # =========================
+    # SCHEDULER THREAD
+    # =========================
+    def _schedule(self, due, token, action):
+        heapq.heappush(self.timers, (due, next(self.order), token, action))
+
+    def _pending(self, token):
+        return any(t is token and action == "next" for _, _, t, action in self.timers)
+
+    def _set(self, left, right):
+        self.left, self.right = left, right
+        if self.log: print("[MOTION] STOP" if left == 0 and right == 0 else f"[MOTION] {left}, {right}")
+        self.send(left, right)
+
+    def _finish(self, token, cancelled=False):
+        token.cancelled = token.cancelled or cancelled
+        token.done.set()
+
+    def _next(self, start):
+        # Starts the next step at `start` (the previous step's due time, so no drift)
+        token = self.token
+        if not self.steps:
+            self._set(0.0, 0.0)
+            self._finish(token)
+            return
+        left, right, duration = self.steps.popleft()
+        self._set(left, right)
+        if duration is not None:
+            self._schedule(start + duration, token, "next")
+        elif self.steps:
+            self._next(start)  # untimed step in the middle of a plan: the next one takes over
+
+    def _loop(self):
+        with self.cond:
+            while True:
+                if not self.timers:
+                    self.cond.wait()
+                    continue
+                due, _, token, action = self.timers[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self.cond.wait(delay)
+                    continue
+                heapq.heappop(self.timers)
+                if token is not self.token or token.cancelled:
+                    continue  # timer of a replaced or cancelled plan
+                if action == "next":
+                    self._next(due)
+                elif action == "deadline":
+                    self._finish(token, cancelled=True)
+                    self.steps.clear()
+                    self._set(0.0, 0.0)
@@ -0,0 +1,151 @@
+import socket as pysocket
+import struct
+import threading
+import time
+import zmq
+
+from scripts import metrics
+
+# =========================
+# WIRE FORMAT
+# =========================
+# DEALER frames: [header][empty delimiter][left, right as "dd"]
+# The simulator REP socket treats everything up to the delimiter as a routing
+# envelope and echoes it back with its reply, so the header comes back with the
+# ack and the simulator side keeps receiving the plain 16 byte "dd" payload.
+VERSION = 1
+HEADER = struct.Struct("<BIQ")  # version, sequence, send time (ns)
+PAYLOAD = struct.Struct("dd")
+
+class MotorChannel:
+    # Latest-value-wins: at most one command is in flight, anything sent while
+    # waiting for its ack replaces the pending command instead of queueing.
+    def __init__(self, ack_timeout=0.5, on_connect=None):
+        self.address = None
+        self.ack_timeout = ack_timeout
+        self.on_connect = on_connect
+        self.ctx = zmq.Context.instance()
+
+        self._lock = threading.Lock()
+        self._pending = None
+        self._wake_r, self._wake_w = pysocket.socketpair()
+        self._wake_r.setblocking(False)
+        self._thread = None
+        self._running = False
+
+        self.connected = False
+        self.last_command = (0.0, 0.0)
+        self.sent = 0
+        self.acked = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.last_rtt = None
+        self.avg_rtt = None
+
+    def connect(self, address):
+        self.address = address
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def send(self, left, right):
+        # Never blocks, returns immediately whatever the simulator is doing
+        with self._lock:
+            if self._pending is not None:
+                self.dropped += 1
+                metrics.count("motor_replaced")
+            self._pending = (float(left), float(right))
+            self.last_command = self._pending
+        try: self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError): pass
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "sent": self.sent,
+            "acked": self.acked,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "last_rtt_ms": None if self.last_rtt is None else self.last_rtt * 1000,
+            "avg_rtt_ms": None if self.avg_rtt is None else self.avg_rtt * 1000,
+        }
+
+    def close(self):
+        self._running = False
+        self._wake_w.send(b"\0")
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+    # =========================
+    # I/O THREAD
+    # =========================
+    def _open(self):
+        sock = self.ctx.socket(zmq.DEALER)
+        sock.setsockopt(zmq.LINGER, 0)
+        sock.connect(self.address)
+        return sock
+
+    def _loop(self):
+        sock = self._open()
+        poller = zmq.Poller()
+        poller.register(sock, zmq.POLLIN)
+        poller.register(self._wake_r, zmq.POLLIN)
+        seq = 0
+        in_flight = None  # (seq, command, sent_at)
+
+        while self._running:
+            timeout = None
+            if in_flight is not None:
+                timeout = max(0, int((in_flight[2] + self.ack_timeout - time.monotonic()) * 1000))
+            events = dict(poller.poll(timeout))
+
+            if self._wake_r.fileno() in events or self._wake_r in events:
+                try:
+                    while self._wake_r.recv(1024): pass
+                except (BlockingIOError, OSError):
+                    pass
+
+            if sock in events:
+                header, _, _ = sock.recv_multipart()
+                _, ack_seq, _ = HEADER.unpack(header)
+                if in_flight is not None and ack_seq == in_flight[0]:
+                    rtt = time.monotonic() - in_flight[2]
+                    self.last_rtt = rtt
+                    metrics.observe("motor_rtt", rtt)
+                    self.avg_rtt = rtt if self.avg_rtt is None else self.avg_rtt * 0.9 + rtt * 0.1
+                    self.acked += 1
+                    in_flight = None
+                    if not self.connected:
+                        self.connected = True
+                        if self.on_connect: self.on_connect()
+
+            # Lazy pirate: no ack in time, rebuild the socket and resend the newest command
+            if in_flight is not None and time.monotonic() - in_flight[2] > self.ack_timeout:
+                poller.unregister(sock)
+                sock.close()
+                sock = self._open()
+                poller.register(sock, zmq.POLLIN)
+                self.reconnects += 1
+                metrics.count("motor_reconnects")
+                self.connected = False
+                with self._lock:
+                    if self._pending is None:
+                        self._pending = in_flight[1]
+                in_flight = None
+
+            if in_flight is None:
+                with self._lock:
+                    command, self._pending = self._pending, None
+                if command is not None:
+                    seq = (seq + 1) & 0xFFFFFFFF
+                    sent_at = time.monotonic()
+                    sock.send_multipart([
+                        HEADER.pack(VERSION, seq, time.time_ns()),
+                        b"",
+                        PAYLOAD.pack(*command),
+                    ])
+                    self.sent += 1
+                    in_flight = (seq, command, sent_at)
+
+        sock.close()
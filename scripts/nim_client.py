@@ -0,0 +1,186 @@
+import asyncio
+import random
+import threading
+import time
+import httpx
+
+# =========================
+# TYPED ERRORS
+# =========================
+class NimError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class NimConnectionError(NimError): pass
+class NimTimeout(NimError): pass
+class NimAuthError(NimError): pass
+class NimRequestError(NimError): pass
+class NimServerError(NimError): pass
+
+class NimRateLimited(NimError):
+    def __init__(self, message, status=429, retry_after=None):
+        super().__init__(message, status)
+        self.retry_after = retry_after
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+def _retry_after(response):
+    try: return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError): return None
+
+def _error_for(response):
+    status = response.status_code
+    try: detail = response.json().get("detail") or response.text
+    except Exception: detail = response.text
+    message = f"HTTP {status}: {str(detail)[:200]}"
+    if status == 429: return NimRateLimited(message, status, _retry_after(response))
+    if status in (401, 403): return NimAuthError(message, status)
+    if status >= 500: return NimServerError(message, status)
+    return NimRequestError(message, status)
+
+def _wrap(e):
+    if isinstance(e, httpx.TimeoutException): return NimTimeout(f"Request timed out ({type(e).__name__})")
+    return NimConnectionError(f"Connection failed: {e}")
+
+def _json(response):
+    # A 200 with a body that is not JSON (proxy pages, truncated bodies) is a request error too
+    try: return response.json()
+    except ValueError: raise NimRequestError(f"Malformed response: {response.text[:200]}", response.status_code)
+
+def _has_http2():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+# =========================
+# POOLED CLIENT
+# =========================
+class NimClient:
+    # One keep-alive pool per process, shared by every request. Sync and async
+    # APIs retry 429/5xx and connection failures with jittered backoff.
+    def __init__(self, connect_timeout=5.0, read_timeout=120.0, max_connections=8, max_concurrency=4,
+                 retries=3, backoff=0.5, max_backoff=8.0, http2=None):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.http2 = _has_http2() if http2 is None else http2
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.client = httpx.Client(http2=self.http2, timeout=self.timeout, limits=self.limits)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_client = None
+        self._async_slots = None
+
+    def _delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    # =========================
+    # SYNC
+    # =========================
+    def _attempts(self, send, retry_reads=True):
+        # send() -> response (already checked) ; retries transient failures.
+        # retry_reads=False: a completion that timed out while generating is not sent again,
+        # each try would wait the whole read timeout once more.
+        for attempt in range(self.retries + 1):
+            try:
+                return send()
+            except httpx.HTTPError as e:
+                error = _wrap(e)
+                if isinstance(e, httpx.ReadTimeout) and not retry_reads: raise error
+            except NimError as e:
+                error = e
+            if attempt == self.retries or (error.status is not None and error.status not in RETRY_STATUS):
+                raise error
+            time.sleep(self._delay(attempt, getattr(error, "retry_after", None)))
+
+    def post_json(self, url, headers, payload):
+        def send():
+            response = self.client.post(url, headers=headers, json=payload)
+            if response.status_code >= 400: raise _error_for(response)
+            return _json(response)
+
+        with self.slots:
+            return self._attempts(send, retry_reads=False)
+
+    def stream_lines(self, url, headers, payload):
+        # Retries only until the first byte arrives, a half-consumed stream is never replayed
+        with self.slots:
+            def open_stream():
+                response = self.client.send(self.client.build_request("POST", url, headers=headers, json=payload), stream=True)
+                if response.status_code >= 400:
+                    response.read()
+                    response.close()
+                    raise _error_for(response)
+                return response
+
+            response = self._attempts(open_stream)
+            try:
+                for line in response.iter_lines():
+                    yield line
+            except httpx.HTTPError as e:
+                raise _wrap(e)
+            finally:
+                response.close()
+
+    # =========================
+    # ASYNC
+    # =========================
+    def _async(self):
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(http2=self.http2, timeout=self.timeout, limits=self.limits)
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        return self._async_client
+
+    async def _aattempts(self, send, retry_reads=True):
+        for attempt in range(self.retries + 1):
+            try:
+                return await send()
+            except httpx.HTTPError as e:
+                error = _wrap(e)
+                if isinstance(e, httpx.ReadTimeout) and not retry_reads: raise error
+            except NimError as e:
+                error = e
+            if attempt == self.retries or (error.status is not None and error.status not in RETRY_STATUS):
+                raise error
+            await asyncio.sleep(self._delay(attempt, getattr(error, "retry_after", None)))
+
+    async def apost_json(self, url, headers, payload):
+        client = self._async()
+
+        async def send():
+            response = await client.post(url, headers=headers, json=payload)
+            if response.status_code >= 400: raise _error_for(response)
+            return _json(response)
+
+        async with self._async_slots:
+            return await self._aattempts(send, retry_reads=False)
+
+    async def astream_lines(self, url, headers, payload):
+        client = self._async()
+        async with self._async_slots:
+            async def open_stream():
+                response = await client.send(client.build_request("POST", url, headers=headers, json=payload), stream=True)
+                if response.status_code >= 400:
+                    await response.aread()
+                    await response.aclose()
+                    raise _error_for(response)
+                return response
+
+            response = await self._aattempts(open_stream)
+            try:
+                async for line in response.aiter_lines():
+                    yield line
+            except httpx.HTTPError as e:
+                raise _wrap(e)
+            finally:
+                await response.aclose()
+
+    def close(self):
+        self.client.close()
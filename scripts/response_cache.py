@@ -0,0 +1,97 @@
+from collections import OrderedDict
+import re
+import threading
+import time
+import cv2
+
+# =========================
+# KEYS
+# =========================
+MOTION_WORDS = {
+    "forward", "backward", "back", "left", "right", "stop", "halt", "speed", "faster", "slower",
+    "target", "follow", "track", "move", "go", "turn", "rotate", "drive", "come", "share", "show",
+}
+
+def normalize_prompt(prompt):
+    return " ".join(re.sub(r"[^\w\s]", " ", prompt.lower()).split())
+
+def is_cacheable(prompt):
+    # Anything that could make the robot act is always sent to the model
+    return not (set(normalize_prompt(prompt).split()) & MOTION_WORDS)
+
+def dhash(image, size=8):
+    # 64 bit difference hash, robust to noise and small exposure changes
+    small = cv2.resize(image, (size + 1, size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+# =========================
+# RESPONSE CACHE
+# =========================
+class ResponseCache:
+    def __init__(self, enabled=False, capacity=128, ttl=60.0, max_distance=6):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (prompt, file hash) -> [(frame hash, response, stored at, latency)]
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.saved_seconds = 0.0
+
+    def _key(self, prompt, file_hash):
+        return normalize_prompt(prompt), file_hash
+
+    def get(self, prompt, frame_hash, file_hash=None):
+        if not self.enabled:
+            return None
+        if not is_cacheable(prompt):
+            self.bypassed += 1
+            return None
+        now = time.monotonic()
+        with self.lock:
+            key = self._key(prompt, file_hash)
+            entries = [e for e in self.entries.get(key, []) if now - e[2] <= self.ttl]
+            if entries: self.entries[key] = entries
+            else: self.entries.pop(key, None)
+
+            for stored_hash, response, _, latency in reversed(entries):
+                if frame_hash is None or stored_hash is None:
+                    match = frame_hash == stored_hash
+                else:
+                    match = hamming(frame_hash, stored_hash) <= self.max_distance
+                if match:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    self.saved_seconds += latency
+                    return response
+            self.misses += 1
+            return None
+
+    def put(self, prompt, frame_hash, response, latency, file_hash=None, has_commands=False):
+        if not self.enabled or has_commands or not is_cacheable(prompt):
+            return
+        with self.lock:
+            key = self._key(prompt, file_hash)
+            self.entries.setdefault(key, []).append((frame_hash, response, time.monotonic(), latency))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds, "entries": len(self.entries),
+        }
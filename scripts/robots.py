@@ -0,0 +1,81 @@
+import re
+
+from scripts.commands import Robot
+from scripts.framering import META_FILE, NOTIFY_ADDRESS
+
+# =========================
+# ROBOT REGISTRY
+# =========================
+# One main.py process drives every Carter listed in the `robots` section of
+# config.yaml. nemo.py publishes one frame ring per entry; main.py gives each
+# robot its own motor channel, tracker and dialogue, and shares the detector,
+# the embeddings cache and the HTTP client between them.
+DEFAULT_ROBOT = {
+    "name": "carter",
+    "prim": "/World/carter_v1",
+    "camera": None,  # default: the first-person camera under `prim`
+    "meta_file": META_FILE,
+    "notify": NOTIFY_ADDRESS,
+    "motor": "tcp://localhost:5555",
+    "stream": "tcp://127.0.0.1:5570",  # network frames, only with frame_stream.enabled
+}
+
+CAMERA_MOUNT = "/chassis_link/camera_mount/carter_camera_first_person"
+
+# "@carter2 follow the box" -> ("carter2", "follow the box")
+ADDRESS = re.compile(r"^\s*@([\w-]+)[\s,:]*(.*)$", re.S)
+
+def robot_entries(config):
+    # `robots` section -> complete entries; no section means the single default robot
+    entries = []
+    for i, entry in enumerate(config.get("robots") or [{}]):
+        full = dict(DEFAULT_ROBOT)
+        if i > 0:
+            # Later robots never reuse the first one's ring or sockets by accident
+            full.update(name=f"carter{i + 1}", prim=None, meta_file=f"scripts/Apdata_{i + 1}.txt",
+                        notify=f"tcp://127.0.0.1:{5556 + 10 * i}", motor=f"tcp://localhost:{5555 + 10 * i}",
+                        stream=f"tcp://127.0.0.1:{5570 + 10 * i}")
+        full.update(entry or {})
+        # Each robot needs its own camera, never the first one's by default
+        if not full["camera"]:
+            if not full["prim"]:
+                raise ValueError(f"Robot {full['name']} in config.yaml needs `prim` (its Carter prim path) "
+                                 f"or `camera`, only the first robot has a default")
+            full["camera"] = full["prim"].rstrip("/") + CAMERA_MOUNT
+        entries.append(full)
+    names = [entry["name"] for entry in entries]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate robot names in config.yaml: {names}")
+    return entries
+
+class RobotRegistry:
+    def __init__(self, entries):
+        self.robots = {}
+        for entry in entries:
+            self.robots[entry["name"]] = Robot(entry["name"], entry["motor"], entry["meta_file"],
+                                               entry.get("notify"), entry.get("stream"))
+        self.selected = next(iter(self.robots.values()))
+
+    def __iter__(self):
+        return iter(self.robots.values())
+
+    def __len__(self):
+        return len(self.robots)
+
+    def get(self, name=None):
+        return self.robots.get(name) if name else self.selected
+
+    def resolve(self, prompt):
+        # -> (robot, prompt without the address). Addressing a robot also selects it
+        # for the following prompts; unknown names stay part of the prompt.
+        match = ADDRESS.match(prompt or "")
+        if match and match.group(1) in self.robots:
+            self.selected = self.robots[match.group(1)]
+            return self.selected, match.group(2)
+        return self.selected, prompt
+
+    def connect(self):
+        for bot in self: bot.connect_zmq()
+
+    def close(self):
+        for bot in self: bot.close()
@@ -0,0 +1,274 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+import cv2
+import numpy as np
+import zmq
+
+from scripts.framering import FrameWriter, META_FILE, NOTIFY_ADDRESS
+from scripts.motor import HEADER, PAYLOAD
+
+# Local replacements for Isaac Sim, its motor socket and the NIM endpoint,
+# so the whole pipeline can run headless (benchmark.py)
+
+# =========================
+# FRAME PUBLISHER (replaces nemo.py)
+# =========================
+def load_frames(source=None, size=(640, 480), limit=300):
+    # Directory of images, a video file, or None for a synthetic scene
+    width, height = size
+    if source is None:
+        return synthetic_frames(width, height, count=min(limit, 120))
+
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "*"))
+                       if os.path.splitext(p)[1].lower() in (".png", ".jpg", ".jpeg", ".bmp", ".webp"))
+        images = (cv2.imread(p) for p in paths[:limit])
+    else:
+        cap = cv2.VideoCapture(source)
+        images = []
+        while len(images) < limit:
+            ok, image = cap.read()
+            if not ok: break
+            images.append(image)
+        cap.release()
+
+    frames = [cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+              for image in images if image is not None]
+    if not frames:
+        raise ValueError(f"No frames could be read from {source}")
+    return frames
+
+def synthetic_frames(width, height, count=120):
+    # A red box drifting left and right over a noisy grey room
+    rng = np.random.default_rng(0)
+    background = rng.integers(70, 110, (height, width, 3), dtype=np.uint8)
+    side = max(20, height // 6)
+    frames = []
+    for i in range(count):
+        image = background.copy()
+        x = int((width - side) * (0.5 + 0.4 * np.sin(2 * np.pi * i / count)))
+        y = (height - side) // 2
+        cv2.rectangle(image, (x, y), (x + side, y + side), (20, 20, 220), -1)
+        frames.append(image)
+    return frames
+
+class FramePublisher:
+    # Writes the frames into a real FrameWriter ring at a fixed rate, looping,
+    # and through `sender` (a FrameSender) too when given, like nemo.py
+    def __init__(self, frames, fps=30.0, meta_file=META_FILE, notify_address=NOTIFY_ADDRESS, sender=None):
+        self.frames = frames
+        self.fps = fps
+        self.sender = sender
+        self.writer = FrameWriter(frames[0].shape, np.uint8, slots=4, meta_file=meta_file,
+                                  notify_address=notify_address)
+        self.meta_file = self.writer.meta_file
+        self.published = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        period = 1.0 / self.fps
+        next_at = time.perf_counter()
+        while self._running:
+            image, timestamp = self.frames[self.published % len(self.frames)], time.time()
+            frame_id = self.writer.write(image, timestamp=timestamp, sim_step=self.published)
+            if self.sender is not None: self.sender.send(image, frame_id, timestamp, self.published)
+            self.published += 1
+            next_at += period
+            delay = next_at - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+            else: next_at = time.perf_counter()
+
+    def close(self):
+        self._running = False
+        if self._thread: self._thread.join(timeout=1.0)
+        if self.sender is not None: self.sender.close()
+        self.writer.close()
+
+# =========================
+# MOTOR SINK (replaces the simulator REP socket)
+# =========================
+class MotorSink:
+    # Acks every command like the simulator does and records (received at, left, right, seq)
+    def __init__(self, address="tcp://127.0.0.1:5557", delay=0.0):
+        self.address = address
+        self.delay = delay
+        self.ctx = zmq.Context.instance()
+        self.lock = threading.Lock()
+        self.records = []
+        self.times = []
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        sock = self.ctx.socket(zmq.ROUTER)
+        sock.setsockopt(zmq.LINGER, 0)
+        sock.bind(self.address)
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, args=(sock,), daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self, sock):
+        while self._running:
+            if not sock.poll(100): continue
+            identity, header, empty, payload = sock.recv_multipart()
+            received = time.monotonic()
+            left, right = PAYLOAD.unpack(payload)
+            _, seq, _ = HEADER.unpack(header)
+            with self.lock:
+                self.times.append(received)
+                self.records.append((received, left, right, seq))
+            if self.delay: time.sleep(self.delay)
+            sock.send_multipart([identity, header, empty, b"ok"])
+        sock.close()
+
+    def first_after(self, since, timeout=5.0):
+        # -> time of the first command received at or after `since`, or None
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                index = bisect.bisect_left(self.times, since)
+                if index < len(self.times):
+                    return self.times[index]
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.0005)
+
+    def count_since(self, since):
+        with self.lock:
+            return len(self.times) - bisect.bisect_left(self.times, since)
+
+    def close(self):
+        self._running = False
+        if self._thread: self._thread.join(timeout=1.0)
+
+# =========================
+# MOCK NIM (OpenAI compatible chat completions)
+# =========================
+class MockNim:
+    # replies: {substring of the user prompt: reply}, first match wins, else `default`
+    def __init__(self, replies=None, default="I can see the room in front of me.", ttft=0.3,
+                 token_delay=0.01, host="127.0.0.1", port=0):
+        self.replies = replies or {}
+        self.default = default
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.requests = 0
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                mock.requests += 1
+                reply = mock.reply_for(body.get("messages") or [])
+                time.sleep(mock.ttft)
+                if body.get("stream"):
+                    self._stream(reply)
+                else:
+                    time.sleep(mock.token_delay * len(reply.split()))
+                    data = json.dumps({"choices": [{"message": {"role": "assistant", "content": reply}}]}).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+
+            def _chunk(self, text):
+                data = text.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, reply):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                # One event per word, like a token stream
+                words = reply.split(" ")
+                for i, word in enumerate(words):
+                    delta = word if i == 0 else " " + word
+                    event = {"choices": [{"delta": {"content": delta}}]}
+                    self._chunk(f"data: {json.dumps(event)}\n\n")
+                    time.sleep(mock.token_delay)
+                self._chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                pass  # clients dropping pooled connections on exit
+
+        self.server = Server((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}/v1/chat/completions"
+        self._thread = None
+
+    def reply_for(self, messages):
+        content = messages[-1].get("content", "") if messages else ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+        for key, reply in self.replies.items():
+            if key in content:
+                return reply
+        return self.default
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# =========================
+# COLOUR DETECTOR (replaces YOLOE)
+# =========================
+class ColorDetector:
+    # Detector backend (scripts/detectors.py) that finds red blobs, reported as the first class.
+    # `cost` adds a fixed inference time so tracker numbers stay meaningful.
+    def __init__(self, cost=0.0, min_area=100):
+        self.cost = cost
+        self.min_area = min_area
+        self.calls = 0
+
+    def warmup(self, names):
+        pass
+
+    def detect(self, images, names, conf=0.2, imgsz=640):
+        # A list of images is one batched call, like YOLOE (one `cost` for the whole batch)
+        self.calls += 1
+        if self.cost: time.sleep(self.cost)
+        return [self._detect(image) for image in images]
+
+    def _detect(self, image):
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, (0, 120, 80), (10, 255, 255)) | cv2.inRange(hsv, (170, 120, 80), (180, 255, 255))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h >= self.min_area:
+                boxes.append((float(x), float(y), float(x + w), float(y + h), 0.9, 0))
+        return boxes
+
+    def stats(self):
+        return {"backend": "color", "calls": self.calls}
@@ -0,0 +1,121 @@
+import threading
+import time
+
+# =========================
+# STARTUP PROFILE
+# =========================
+class StartupProfile:
+    # Wall-clock marks relative to process start, printed by --profile-startup
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.lock = threading.Lock()
+        self.spans = []   # (name, begin, end, thread)
+        self.marks = {}
+
+    def now(self):
+        return time.perf_counter() - self.start
+
+    def mark(self, name):
+        with self.lock:
+            self.marks.setdefault(name, self.now())
+
+    def span(self, name):
+        profile = self
+
+        class _Span:
+            def __enter__(self):
+                self.begin = profile.now()
+                return self
+
+            def __exit__(self, *exc):
+                with profile.lock:
+                    profile.spans.append((name, self.begin, profile.now(), threading.current_thread().name))
+        return _Span()
+
+    def report(self):
+        lines = ["", "=== STARTUP PROFILE (seconds since launch) ==="]
+        for name, begin, end, thread in sorted(self.spans, key=lambda s: s[1]):
+            lines.append(f"  {name:<28} {begin:7.3f} -> {end:7.3f}  ({end - begin:6.3f}s)  [{thread}]")
+        for name, at in sorted(self.marks.items(), key=lambda m: m[1]):
+            lines.append(f"  * {name:<26} {at:7.3f}")
+        return "\n".join(lines)
+
+# =========================
+# BACKGROUND LOADER
+# =========================
+class Loader:
+    # Named background tasks with readiness states the GUI can poll:
+    # "pending" -> "ready" | "failed". Retried tasks stay pending between attempts.
+    def __init__(self, profile=None):
+        self.profile = profile or StartupProfile()
+        self.lock = threading.Lock()
+        self.status = {}
+        self.errors = {}
+        self.events = {}
+        self.waiting = {}
+
+    def _event(self, name):
+        with self.lock:
+            return self.events.setdefault(name, threading.Event())
+
+    def submit(self, name, task, retry_every=None):
+        # retry_every: keep calling `task` until it succeeds (simulator not up yet...)
+        with self.lock:
+            self.status[name] = "pending"
+        self._event(name)
+
+        def run():
+            # One span per stage, covering every retry until it settles
+            state = "ready"
+            with self.profile.span(name):
+                while True:
+                    try:
+                        task()
+                        break
+                    except Exception as e:
+                        self.errors[name] = e
+                        if retry_every is None:
+                            print(f"[STARTUP] {name} failed: {e}")
+                            state = "failed"
+                            break
+                        time.sleep(retry_every)
+            self._finish(name, state)
+
+        # Daemon threads: a simulator that never shows up must not keep the app alive on exit
+        threading.Thread(target=run, name=f"startup-{name}", daemon=True).start()
+
+    def _finish(self, name, state):
+        with self.lock:
+            self.status[name] = state
+            waiting = self.waiting.pop(name, [])
+        self.profile.mark(f"{name} {state}")
+        self._event(name).set()
+        for callback, on_failure in waiting:
+            self._settle(name, state, callback, on_failure)
+
+    def _settle(self, name, state, callback, on_failure):
+        if state == "ready": callback()
+        elif on_failure is not None: on_failure(self.errors.get(name))
+        else: print(f"[STARTUP] {name} failed, a task waiting for it was dropped")
+
+    def ready(self, name):
+        return self.status.get(name) == "ready"
+
+    def when_ready(self, name, callback, on_failure=None):
+        # Runs now if `name` is ready, otherwise right after it becomes ready.
+        # If it fails instead, on_failure(error) runs (now, if it already has).
+        with self.lock:
+            state = self.status.get(name)
+            if state not in ("ready", "failed"):
+                self.waiting.setdefault(name, []).append((callback, on_failure))
+                return False
+        self._settle(name, state, callback, on_failure)
+        return state == "ready"
+
+    def wait(self, name, timeout=None):
+        self._event(name).wait(timeout)
+        return self.ready(name)
+
+    def settled(self):
+        with self.lock:
+            return all(state != "pending" for state in self.status.values())
@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+import numpy as np
+
+from scripts import metrics
+
+# =========================
+# RESIDENT SPEECH-TO-TEXT
+# =========================
+class SpeechService:
+    # Loads faster-whisper once and keeps it warm. listen() captures the mic
+    # into a preallocated buffer, detects speech with an energy VAD and
+    # transcribes the utterance so far every `partial_interval` seconds.
+    def __init__(self, model_size="tiny", device="cpu", compute_type="int8", beam_size=1,
+                 sample_rate=16000, block_ms=30, partial_interval=0.8, silence=0.8,
+                 max_phrase=15.0, vad_ratio=3.0, min_level=0.005, language=None):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.beam_size = beam_size
+        self.sample_rate = sample_rate
+        self.block = int(sample_rate * block_ms / 1000)
+        self.partial_interval = partial_interval
+        self.silence = silence
+        self.vad_ratio = vad_ratio
+        self.min_level = min_level
+        self.language = language
+
+        self.audio = np.zeros(int(max_phrase * sample_rate), dtype=np.float32)
+        self.model = None
+        self._load_lock = threading.Lock()
+        self.last_rtf = None
+
+    def load(self):
+        with self._load_lock:
+            if self.model is not None:
+                return self.model
+            # Runs as the "speech" startup stage, or on first use; failures surface there
+            from faster_whisper import WhisperModel
+            start = time.perf_counter()
+            self.model = WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type)
+            # First call pays for graph setup, do it before anyone talks
+            self._transcribe(np.zeros(self.sample_rate, dtype=np.float32))
+            print(f"[STT] {self.model_size}/{self.compute_type} ready in {time.perf_counter() - start:.1f}s")
+            return self.model
+
+    def _transcribe(self, samples):
+        start = time.perf_counter()
+        with metrics.span("stt_transcribe", audio_seconds=round(len(samples) / self.sample_rate, 2)):
+            segments, _ = self.model.transcribe(samples, beam_size=self.beam_size, language=self.language,
+                                                condition_on_previous_text=False)
+            text = " ".join(segment.text.strip() for segment in segments).strip()
+        duration = len(samples) / self.sample_rate
+        if duration > 0:
+            self.last_rtf = (time.perf_counter() - start) / duration
+        return text
+
+    def listen(self, on_partial=None, should_stop=lambda: False):
+        # Blocks until the phrase ends (or should_stop()), returns the final text
+        import sounddevice
+        self.load()
+
+        blocks = queue.Queue()
+        def callback(indata, frames, time_info, status):
+            blocks.put(indata[:, 0].copy())
+
+        filled = 0
+        noise = None
+        speaking = False
+        silent_for = 0.0
+        last_partial = 0.0
+        block_seconds = self.block / self.sample_rate
+
+        with sounddevice.InputStream(samplerate=self.sample_rate, channels=1, dtype="float32",
+                                     blocksize=self.block, callback=callback):
+            while not should_stop():
+                try: block = blocks.get(timeout=0.1)
+                except queue.Empty: continue
+
+                level = float(np.sqrt(np.mean(block * block)))
+                if noise is None: noise = level
+                threshold = max(self.min_level, noise * self.vad_ratio)
+
+                if level > threshold:
+                    speaking, silent_for = True, 0.0
+                elif not speaking:
+                    # Track the ambient floor while waiting, no fixed calibration pause
+                    noise = noise * 0.95 + level * 0.05
+                    continue
+                else:
+                    silent_for += block_seconds
+
+                n = min(len(block), len(self.audio) - filled)
+                self.audio[filled:filled + n] = block[:n]
+                filled += n
+
+                if silent_for >= self.silence or filled >= len(self.audio):
+                    break
+                if on_partial and filled / self.sample_rate - last_partial >= self.partial_interval:
+                    last_partial = filled / self.sample_rate
+                    on_partial(self._transcribe(self.audio[:filled]))
+
+        if filled == 0:
+            return ""
+        text = self._transcribe(self.audio[:filled])
+        print(f"[STT] {filled / self.sample_rate:.1f}s of audio, RTF {self.last_rtf:.2f}")
+        return text
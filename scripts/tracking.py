@@ -0,0 +1,149 @@
+import cv2
+import numpy as np
+
+# =========================
+# KALMAN BOX
+# =========================
+class KalmanBox:
+    # Constant velocity model on the box center, size is tracked without velocity.
+    # state: cx, cy, w, h, vx, vy   measurement: cx, cy, w, h
+    def __init__(self, box):
+        kf = cv2.KalmanFilter(6, 4)
+        kf.transitionMatrix = np.eye(6, dtype=np.float32)
+        kf.transitionMatrix[0, 4] = 1.0
+        kf.transitionMatrix[1, 5] = 1.0
+        kf.measurementMatrix = np.eye(4, 6, dtype=np.float32)
+        kf.processNoiseCov = np.diag([1, 1, 4, 4, 10, 10]).astype(np.float32)
+        kf.measurementNoiseCov = np.diag([4, 4, 16, 16]).astype(np.float32)
+        kf.errorCovPost = np.eye(6, dtype=np.float32) * 10
+        kf.statePost = np.array([*self._measure(box), 0, 0], dtype=np.float32).reshape(6, 1)
+        self.kf = kf
+
+    @staticmethod
+    def _measure(box):
+        x1, y1, x2, y2 = box
+        return (x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1
+
+    @staticmethod
+    def _box(state):
+        cx, cy, w, h = (float(v) for v in state[:4, 0])
+        return cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2
+
+    def predict(self):
+        return self._box(self.kf.predict())
+
+    def correct(self, box):
+        self.kf.correct(np.array(self._measure(box), dtype=np.float32).reshape(4, 1))
+        return self._box(self.kf.statePost)
+
+# =========================
+# HELPERS
+# =========================
+def expand_box(box, scale, width, height):
+    x1, y1, x2, y2 = box
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    hw, hh = (x2 - x1) * scale / 2, (y2 - y1) * scale / 2
+    return (int(max(0, cx - hw)), int(max(0, cy - hh)),
+            int(min(width, cx + hw)), int(min(height, cy + hh)))
+
+def largest_box(boxes):
+    best = None
+    for box in boxes:
+        if best is None or (box[2] - box[0]) * (box[3] - box[1]) > (best[2] - best[0]) * (best[3] - best[1]):
+            best = box
+    return best
+
+# =========================
+# HYBRID TRACKER
+# =========================
+class HybridTracker:
+    # Runs the detector every `detect_every` frames (or when template matching
+    # loses confidence) and follows the box with a Kalman filter + template
+    # match inside a search window in between.
+    #
+    # detect_fn(image, imgsz, region) -> [(x1, y1, x2, y2, conf), ...] in full-frame pixels,
+    # region is an (x1, y1, x2, y2) window of `image` to search, or None for the whole frame
+    def __init__(self, detect_fn, detect_every=5, min_match=0.5, roi_scale=2.0, roi_detect=True, detect_imgsz=640):
+        self.detect_fn = detect_fn
+        self.detect_every = max(1, int(detect_every))
+        self.min_match = min_match
+        self.roi_scale = roi_scale
+        self.roi_detect = roi_detect
+        self.detect_imgsz = detect_imgsz
+
+        self.kalman = None
+        self.template = None
+        self.box = None
+        self.score = 0.0
+        self.since_detect = 0
+        self.detections = 0
+        self.updates = 0
+
+    def reset(self):
+        self.kalman = None
+        self.template = None
+        self.box = None
+        self.score = 0.0
+
+    def _detect(self, image):
+        h, w = image.shape[:2]
+        self.detections += 1
+
+        # Cheaper pass on the expanded ROI first, full frame only if it finds nothing
+        if self.roi_detect and self.box is not None:
+            x1, y1, x2, y2 = expand_box(self.box, self.roi_scale * 1.5, w, h)
+            if x2 - x1 >= 32 and y2 - y1 >= 32:
+                imgsz = min(self.detect_imgsz, max(160, (max(x2 - x1, y2 - y1) + 31) // 32 * 32))
+                found = largest_box(self.detect_fn(image, imgsz, (x1, y1, x2, y2)))
+                if found is not None:
+                    return found
+
+        return largest_box(self.detect_fn(image, self.detect_imgsz, None))
+
+    def _set_template(self, image, box):
+        x1, y1, x2, y2 = (int(v) for v in box)
+        crop = image[max(0, y1):y2, max(0, x1):x2]
+        self.template = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.size else None
+
+    def _match(self, image, predicted):
+        if self.template is None:
+            return None, 0.0
+        h, w = image.shape[:2]
+        th, tw = self.template.shape
+        x1, y1, x2, y2 = expand_box(predicted, self.roi_scale, w, h)
+        if x2 - x1 <= tw or y2 - y1 <= th:
+            return None, 0.0
+
+        roi = cv2.cvtColor(image[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+        result = cv2.matchTemplate(roi, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, loc = cv2.minMaxLoc(result)
+        mx, my = loc[0] + x1, loc[1] + y1
+        return (mx, my, mx + tw, my + th), score
+
+    def update(self, image):
+        # Returns (box or None, "detect" | "track" | "lost")
+        self.updates += 1
+        self.since_detect += 1
+
+        predicted = self.kalman.predict() if self.kalman is not None else None
+        if predicted is not None and self.since_detect < self.detect_every:
+            matched, self.score = self._match(image, predicted)
+            if matched is not None and self.score >= self.min_match:
+                self.box = self.kalman.correct(matched)
+                return self.box, "track"
+
+        self.since_detect = 0
+        found = self._detect(image)
+        if found is None:
+            self.reset()
+            return None, "lost"
+
+        box = found[:4]
+        if self.kalman is None:
+            self.kalman = KalmanBox(box)
+            self.box = box
+        else:
+            self.box = self.kalman.correct(box)
+        self.score = found[4]
+        self._set_template(image, box)
+        return self.box, "detect"
@@ -0,0 +1,57 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from scripts.framenet import HEADER, MAGIC, _Receiver
+from scripts.framering import FrameReader
+
+def message(frame_id, value, codec=b"raw", payload=None):
+    image = np.full((8, 8, 3), value, np.uint8)
+    data = image.tobytes() if payload is None else payload
+    return HEADER.pack(MAGIC, frame_id, 1.0, 0, codec, 8, 8, 3, image.dtype.str.encode(), len(data), 0) + data
+
+@pytest.fixture
+def receiver(tmp_path):
+    receiver = _Receiver(f"inproc://framenet-{os.getpid()}-{id(tmp_path)}", str(tmp_path / "meta.txt"), None)
+    yield receiver
+    receiver.close()
+
+def latest(reader, timeout=1.0):
+    # latest() spins while the slot it looks at is busy, so a stuck slot shows up as a timeout
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("frame", reader.latest()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "FrameReader.latest() did not return"
+    return result["frame"]
+
+def test_bad_packet_leaves_the_ring_usable(receiver):
+    receiver._write(message(1, 10))
+    reader = FrameReader.attach(receiver.meta_file)
+    first = reader.latest()
+
+    with pytest.raises(Exception):
+        receiver._write(message(2, 20, codec=b"jpeg", payload=b"not a jpeg"))
+    frame = latest(reader)
+    assert frame.frame_id == 1 and frame.valid() and first.valid()
+    assert all(reader._slot_seq(slot) % 2 == 0 for slot in range(reader.slots))
+
+    for frame_id in range(3, 3 + 2 * reader.slots):
+        receiver._write(message(frame_id, frame_id))
+        frame = latest(reader)
+        assert frame.valid() and frame.image[0, 0, 0] == frame_id
+    assert all(reader._slot_seq(slot) % 2 == 0 for slot in range(reader.slots))
+    reader.close()
+
+def test_skipped_sender_ids_never_reuse_the_latest_slot(receiver):
+    receiver._write(message(1, 1))
+    reader = FrameReader.attach(receiver.meta_file)
+    first = reader.latest()
+    receiver._write(message(5, 5))
+    assert first.valid() and first.image[0, 0, 0] == 1
+    frame = latest(reader)
+    assert frame.image[0, 0, 0] == 5
+    assert receiver.remote[frame.slot][0] == 5 and receiver.missed == 3
+    reader.close()
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from scripts.intents import IntentParser
+
+PERSONA = os.path.join(os.path.dirname(__file__), "..", "config.txt")
+
+@pytest.fixture
+def parser():
+    with open(PERSONA, encoding="utf-8") as f:
+        return IntentParser(f.read())
+
+@pytest.mark.parametrize("text, target", [
+    ("follow the red box", "red box"),
+    ("track the person", "person"),
+    ("chase a ball", "ball"),
+    ("please follow that chair", "chair"),
+])
+def test_follow_targets(parser, text, target):
+    commands, reply = parser.parse(text)
+    assert commands == [f"target {target}"]
+    assert reply == f"Following the {target}."
+
+@pytest.mark.parametrize("text", [
+    "follow me", "track it", "follow that", "follow him", "follow her", "track them", "follow this",
+    "follow it around", "go to sleep", "go to the kitchen", "move to the door", "go towards the window",
+])
+def test_follow_without_a_class_goes_to_the_vlm(parser, text):
+    assert parser.parse(text) is None
+
+def test_motion_and_stop(parser):
+    assert parser.parse("stop") == (["stop"], "Stopping.")
+    assert parser.parse("move forward 2 seconds then turn left") == \
+        (["forward 2", "left"], "Moving forward for 2s. Moving left.")
+
+def test_conditional_requests_go_to_the_vlm(parser):
+    assert parser.parse("go forward if the way is clear") is None
+    assert parser.parse("can you see the box?") is None